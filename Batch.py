@@ -0,0 +1,176 @@
+from Number import Number, UndefinedError, ComplexUnimplemented
+from Number import PreDefs
+from Number_tests import assert_equal
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+
+
+n_ = PreDefs()
+
+
+class JobResult:
+    """
+    The outcome of one (operator, a, b) job: its value, or the error it raised.
+
+    Errors are kept rather than raised so one failing job does not take down the
+    rest of its batch.  unwrap() gives the value or raises the error here.
+    """
+    __slots__ = ('index', 'job', 'value', 'error')
+
+    def __init__(self, index, job, value=None, error=None):
+        self.index = index
+        self.job = job
+        self.value = value
+        self.error = error
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    def unwrap(self):
+        if self.error is not None:
+            raise self.error
+        return self.value
+
+
+# Operators without a second operand
+unary = {"inc", "dec"}
+
+
+def run_job(index, job):
+    operator, a, b = job
+    # Expression Operators carry their Number method's name
+    name = getattr(operator, "name", operator)
+    try:
+        if name not in Batch.operators:
+            raise Exception(f"{name} is not a Number operator")
+        if not isinstance(a, Number):
+            raise Exception(f"You can only {name} Numbers!")
+        # Look the method up on the operand, so a lazy Tower uses its own shortcuts
+        method = getattr(a, name)
+        value = method() if name in unary else method(b)
+        return JobResult(index, job, value)
+    except Exception as error:
+        return JobResult(index, job, error=error)
+
+
+def _run_chunk(chunk):
+    # Runs in the worker, Numbers arrive and leave pickled as count and sign
+    return [run_job(index, job) for index, job in chunk]
+
+
+class Batch:
+    """
+    Evaluates many (operator, a, b) jobs over a process pool.
+
+    operator is a Number method name such as "tetr" or an Expression Operator,
+    and b is ignored for the unary inc and dec.  Jobs are sent in chunks of
+    chunksize to keep the per-job overhead down.  results() gives every job's
+    JobResult in job order, as_completed() gives them as their chunks finish.
+    With processes=0 the jobs run in this process, which is handy for debugging.
+    """
+
+    operators = {"inc", "add", "mul", "pow", "tetr", "pent", "hexa",
+                 "dec", "sub", "div", "log", "superlog"}
+
+    def __init__(self, processes=None, chunksize=16):
+        if chunksize < 1:
+            raise Exception("A Batch chunksize must be at least one")
+        self.processes = processes
+        self.chunksize = chunksize
+        self._executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def _chunks(self, jobs):
+        chunk = []
+        for index, job in enumerate(jobs):
+            chunk.append((index, job))
+            if len(chunk) == self.chunksize:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    def _submit(self, jobs):
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.processes)
+        return {self._executor.submit(_run_chunk, chunk): chunk for chunk in self._chunks(jobs)}
+
+    def _collect(self, future, chunk):
+        # A worker that dies (out of memory, killed) fails the jobs still in the
+        # pool, and the broken pool is dropped so the next batch gets a fresh one
+        try:
+            return future.result()
+        except BrokenProcessPool as error:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+                self._executor = None
+            return [JobResult(index, job, error=error) for index, job in chunk]
+
+    def as_completed(self, jobs):
+        if self.processes == 0:
+            for index, job in enumerate(jobs):
+                yield run_job(index, job)
+            return
+        futures = self._submit(jobs)
+        for future in as_completed(futures):
+            yield from self._collect(future, futures[future])
+
+    def results(self, jobs):
+        if self.processes == 0:
+            return list(self.as_completed(jobs))
+        futures = self._submit(jobs)
+        return [result for future, chunk in futures.items()
+                for result in self._collect(future, chunk)]
+
+
+def batch_unit_test():
+    three = Number.from_int(3)
+    jobs = [("add", n_.two, three),
+            ("tetr", n_.two, three),
+            ("superlog", Number.from_int(65536), n_.two),
+            ("inc", n_.neg_one, None),
+            ("log", n_.two, n_.zero),
+            ("superlog", n_.two, Number.from_int(-2)),
+            ("div", n_.one, n_.zero),
+            ("sqrt", n_.four, None),
+            ("superlog", n_.two.tetr(n_.six, lazy=True), n_.two)]
+    for processes in (0, 2):
+        with Batch(processes=processes, chunksize=3) as batch:
+            results = batch.results(jobs)
+            assert_equal([result.index for result in results], list(range(len(jobs))))
+            assert_equal(results[0].unwrap().repr_standard(), "5")
+            assert_equal(results[1].unwrap().repr_standard(), "16")
+            assert_equal(results[2].unwrap()[0].repr_standard(), "4")
+            assert_equal(results[3].unwrap().repr_standard(), "0")
+            assert isinstance(results[4].error, UndefinedError)
+            assert isinstance(results[5].error, ComplexUnimplemented)
+            assert isinstance(results[6].error, ZeroDivisionError)
+            assert not results[7].ok
+            # Towers cross to the workers lazily and answer from base and height
+            assert_equal(results[8].unwrap()[0].repr_standard(), "6")
+            completed = sorted(batch.as_completed(jobs), key=lambda result: result.index)
+            assert_equal([result.ok for result in completed], [result.ok for result in results])
+
+    # A job that kills its worker fails, and the next batch runs on a new pool
+    class WorkerExit:
+        def __reduce__(self):
+            return os._exit, (1,)
+    with Batch(processes=1) as batch:
+        assert isinstance(batch.results([("add", n_.one, WorkerExit())])[0].error, BrokenProcessPool)
+        assert_equal(batch.results(jobs[:1])[0].unwrap().repr_standard(), "5")
+
+
+if __name__ == "__main__":
+    batch_unit_test()
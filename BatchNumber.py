@@ -0,0 +1,208 @@
+from Number import Number, NumberState, Magnitude, Sign
+from Number import PreDefs
+from Number_tests import assert_equal
+import numpy as np
+
+
+n_ = PreDefs()
+
+
+class BatchNumber:
+    """
+    Many Numbers held as two arrays, digit counts and negative signs, so one
+    operator runs over all of them at once with NumPy.
+
+    Each element follows the same rules as the Number method of the same name,
+    including -0, the sign of a difference that crosses zero and the sign-first
+    compare.  Operands are another BatchNumber of the same length or a single
+    Number, which is applied to every element.  Counts are int64, so a result
+    that would not fit raises OverflowError instead of wrapping.
+    """
+    __slots__ = ('_counts', '_negative')
+
+    limit = np.iinfo(np.int64).max
+
+    def __init__(self, counts, negative=None):
+        self._counts = np.asarray(counts, dtype=np.int64)
+        if negative is None:
+            negative = np.zeros(self._counts.shape, dtype=bool)
+        self._negative = np.asarray(negative, dtype=bool)
+        if self._counts.ndim != 1 or self._counts.shape != self._negative.shape:
+            raise Exception("BatchNumber needs one count and one sign per element")
+        if (self._counts < 0).any():
+            raise Exception("BatchNumber counts cannot be negative")
+
+    @classmethod
+    def from_numbers(cls, numbers):
+        numbers = list(numbers)
+        counts = np.fromiter((number.state.get_magnitude().count for number in numbers),
+                             dtype=np.int64, count=len(numbers))
+        negative = np.fromiter((number.state.get_sign() == Sign.neg for number in numbers),
+                               dtype=bool, count=len(numbers))
+        return cls(counts, negative)
+
+    @classmethod
+    def from_ints(cls, values):
+        # Plain ints have no -0, so zeros come out non-negative
+        values = np.asarray(values, dtype=np.int64)
+        return cls(np.abs(values), values < 0)
+
+    def to_numbers(self, magnitude=Magnitude):
+        return [Number(NumberState(magnitude(count), Sign.neg if negative else Sign.pos))
+                for count, negative in zip(self._counts.tolist(), self._negative.tolist())]
+
+    @property
+    def counts(self):
+        return self._counts
+
+    @property
+    def negative(self):
+        return self._negative
+
+    def __len__(self):
+        return len(self._counts)
+
+    def _operand(self, b, name):
+        if isinstance(b, Number):
+            return (np.full(self._counts.shape, b.state.get_magnitude().count, dtype=np.int64),
+                    np.full(self._counts.shape, b.state.get_sign() == Sign.neg, dtype=bool))
+        if not isinstance(b, BatchNumber):
+            raise Exception(f"You can only {name} by Numbers or BatchNumbers!")
+        if len(b) != len(self):
+            raise Exception(f"You can only {name} BatchNumbers of the same length!")
+        return b._counts, b._negative
+
+    def _checked_add(self, a, b):
+        if (a > self.limit - b).any():
+            raise OverflowError("BatchNumber count does not fit in int64")
+        return a + b
+
+    def _checked_mul(self, a, b):
+        if (a > self.limit // np.maximum(b, 1)).any():
+            raise OverflowError("BatchNumber count does not fit in int64")
+        return a * b
+
+    def _add_signed(self, counts, negative):
+        # Same rules as Number._add_signed: a zero addend is identity, matching signs
+        # add, otherwise the larger magnitude wins and keeps its sign.
+        same = self._negative == negative
+        larger = counts > self._counts
+        total = self._checked_add(np.where(same, self._counts, 0), np.where(same, counts, 0))
+        result_counts = np.where(same, total, np.abs(self._counts - counts))
+        result_negative = np.where(~same & larger, negative, self._negative)
+        identity = counts == 0
+        return BatchNumber(np.where(identity, self._counts, result_counts),
+                           np.where(identity, self._negative, result_negative))
+
+    def add(self, b):
+        counts, negative = self._operand(b, "add")
+        return self._add_signed(counts, negative)
+
+    def sub(self, s):
+        counts, negative = self._operand(s, "subtract")
+        return self._add_signed(counts, ~negative)
+
+    def mul(self, b):
+        counts, negative = self._operand(b, "mul")
+        return BatchNumber(self._checked_mul(self._counts, counts), self._negative != negative)
+
+    def pow(self, b):
+        """
+        Elementwise self ^ b by squaring, as in Number.pow.  The result is negative
+        where the base is negative and the exponent odd.  A negative exponent gives
+        the quotient of 1 / self ^ |b|, the first half of what Number.pow returns.
+        """
+        counts, negative = self._operand(b, "pow")
+        result = np.ones(self._counts.shape, dtype=np.int64)
+        square = self._counts.copy()
+        exponent = counts.copy()
+        while (exponent > 0).any():
+            odd = (exponent & 1) == 1
+            result = np.where(odd, self._checked_mul(np.where(odd, result, 0),
+                                                     np.where(odd, square, 0)), result)
+            exponent >>= 1
+            more = exponent > 0
+            square = np.where(more, self._checked_mul(np.where(more, square, 0),
+                                                      np.where(more, square, 0)), square)
+        result_negative = self._negative & ((counts & 1) == 1)
+        if negative.any():
+            if (negative & (result == 0)).any():
+                raise ZeroDivisionError()
+            result = np.where(negative, 1 // np.maximum(result, 1), result)
+        return BatchNumber(result, result_negative)
+
+    def div(self, denominator):
+        counts, negative = self._operand(denominator, "divide")
+        if (counts == 0).any():
+            raise ZeroDivisionError()
+        quotient, remainder = np.divmod(self._counts, counts)
+        return (BatchNumber(quotient, self._negative != negative),
+                BatchNumber(remainder, np.zeros(remainder.shape, dtype=bool)))
+
+    def compare(self, b):
+        # Signs decide first, then magnitudes, as in NumberState.compare
+        counts, negative = self._operand(b, "compare")
+        by_magnitude = np.where(self._counts > counts, "greater",
+                                np.where(self._counts < counts, "less", "equal"))
+        by_sign = np.where(self._negative, "less", "greater")
+        return np.where(self._negative != negative, by_sign, by_magnitude).tolist()
+
+    def repr_standard(self):
+        return [("-" if negative and count else "") + str(count)
+                for count, negative in zip(self._counts.tolist(), self._negative.tolist())]
+
+
+def batch_unit_test():
+    values = [-0, 0, 1, -1, 2, -3, 5, 7, -8, 12]
+    numbers = [Number.from_int(value) for value in values]
+    numbers[0] = Number(NumberState(Magnitude(0), Sign.neg))
+    batch = BatchNumber.from_numbers(numbers)
+    assert_equal(len(batch), len(numbers))
+    assert_equal(batch.to_numbers(), numbers)
+
+    # Every pairing against the per-element Number results, signs included
+    for right in numbers:
+        rights = BatchNumber.from_numbers([right] * len(numbers))
+        for name in ("add", "sub", "mul", "compare"):
+            expected = [getattr(left, name)(right) for left in numbers]
+            got = getattr(batch, name)(rights)
+            if name != "compare":
+                got = got.to_numbers()
+            assert_equal(got, expected)
+            assert_equal(got, getattr(batch, name)(right) if name == "compare"
+                         else getattr(batch, name)(right).to_numbers())
+        if right.state.get_magnitude().count == 0:
+            try:
+                batch.div(right)
+                assert False
+            except ZeroDivisionError:
+                pass
+        else:
+            quotient, remainder = batch.div(right)
+            expected = [left.div(right) for left in numbers]
+            assert_equal(quotient.to_numbers(), [pair[0] for pair in expected])
+            assert_equal(remainder.to_numbers(), [pair[1] for pair in expected])
+        if 0 <= right.state.get_magnitude().count <= 7 and right.state.get_sign() == Sign.pos:
+            assert_equal(batch.pow(right).to_numbers(), [left.pow(right) for left in numbers])
+
+    # Negative exponents keep the quotient of Number.pow's division
+    bases = BatchNumber.from_ints([1, -1, 2, 5])
+    assert_equal(bases.pow(n_.neg_one).to_numbers(),
+                 [base.pow(n_.neg_one)[0] for base in bases.to_numbers()])
+
+    assert_equal(BatchNumber.from_ints([3, -4]).repr_standard(), ["3", "-4"])
+    try:
+        BatchNumber.from_ints([2 ** 40]).mul(BatchNumber.from_ints([2 ** 40]))
+        assert False
+    except OverflowError:
+        pass
+    mismatched = False
+    try:
+        batch.add(BatchNumber.from_ints([1]))
+    except Exception:
+        mismatched = True
+    assert mismatched
+
+
+if __name__ == "__main__":
+    batch_unit_test()
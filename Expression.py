@@ -1,7 +1,12 @@
-from Number import Number
+from Number import Number, Tower
+from Number import Magnitude, PackedMagnitude, NumberState, Sign
 from Number import PreDefs
-from Number_tests import assert_val_equal
-import copy
+from Number_tests import assert_val_equal, assert_equal
+from collections import OrderedDict
+import heapq
+import math
+import warnings
+import weakref
 
 
 n_ = PreDefs()
@@ -14,13 +19,260 @@ Operation = (Operator, Expression)
 
 
 
+class CostExceeded(ArithmeticError):
+    pass
+
+
+def _log2(count):
+    # log2 of a digit count, -inf for zero digits.  Past float range, the bit length
+    # is close enough for an estimate.
+    if count == 0:
+        return -math.inf
+    if count.bit_length() < 1000:
+        return math.log2(count)
+    return float(count.bit_length())
+
+
+def _hyper_exact(rank, a, b):
+    # H_rank(a, b) on python ints, only used once the estimate says it is small
+    if rank == 0:
+        return b + 1
+    if rank == 1:
+        return a + b
+    if rank == 2:
+        return a * b
+    if rank == 3:
+        return a ** b
+    value = 1
+    if b > 0:
+        value = a
+        for _ in range(b - 1):
+            value = _hyper_exact(rank - 1, a, value)
+    return value
+
+
+def _hyper_log2(rank, a, b):
+    # log2 of the digit count of H_rank(a, b) for digit counts a and b, without
+    # computing it.  Values are followed exactly while they fit in 62 bits.
+    if rank <= 2:
+        return _log2(_hyper_exact(rank, a, b))
+    if rank == 3:
+        if b == 0 or a == 1:
+            return 0.0
+        if a == 0:
+            return -math.inf
+        if b.bit_length() > 1000:
+            return math.inf
+        return b * math.log2(a)
+    if b == 0:
+        return 0.0
+    if a <= 1:
+        return _log2(a)
+    value = a
+    value_log2 = _log2(a)
+    for _ in range(b - 1):
+        if value is None:
+            return math.inf
+        value_log2 = _hyper_log2(rank - 1, a, value)
+        value = _hyper_exact(rank - 1, a, value) if value_log2 < 62 else None
+    return value_log2
+
+
+class CostEstimate:
+    """
+    A preflight prediction for one operation.
+    digits_log2 is log2 of the result's digit count (-inf for zero, inf when out of
+    any range), nbytes the storage that count needs and steps the approximate number
+    of bulk magnitude operations the computation takes.
+    """
+    __slots__ = ('digits_log2', 'nbytes', 'steps')
+
+    def __init__(self, digits_log2, steps):
+        self.digits_log2 = digits_log2
+        self.nbytes = math.ceil(max(digits_log2, 0.0) / 8) if digits_log2 != math.inf else math.inf
+        self.steps = steps
+
+    def stored_in(self, magnitude):
+        # Size the result for magnitude's backend, when it keeps real digits
+        # (PackedMagnitude, MappedMagnitude) rather than just their count
+        if type(magnitude).nbytes_for is Magnitude.nbytes_for or self.digits_log2 == -math.inf:
+            return self
+        if self.digits_log2 >= 1000:
+            self.nbytes = math.inf
+        else:
+            self.nbytes = magnitude.nbytes_for(math.ceil(2 ** self.digits_log2))
+        return self
+
+
+class CostEstimator:
+    """
+    Predicts result size and cost of an operator from its operands' sizes before it runs.
+
+    Every operator in Operator.operators has an entry in the estimators table, which
+    maps the operands' digit counts to a CostEstimate.  check() refuses (raising
+    CostExceeded) or warns (ResourceWarning) when the prediction is past max_nbytes
+    or max_steps, depending on action.  allows() only answers whether it fits.
+    """
+    __slots__ = ('max_nbytes', 'max_steps', 'action')
+
+    def __init__(self, max_nbytes=2 ** 30, max_steps=10 ** 8, action="raise"):
+        if action not in ("raise", "warn"):
+            raise Exception("A cost estimator can either raise or warn")
+        self.max_nbytes = max_nbytes
+        self.max_steps = max_steps
+        self.action = action
+
+    @staticmethod
+    def _count(value):
+        # The digit count of an operand, read without building a large lazy tower
+        if isinstance(value, Tower) and value._materialized is None:
+            base = value.base.state.get_magnitude().count
+            height = value.height.state.get_magnitude().count
+            if _hyper_log2(4, base, height) >= 62:
+                return None
+        return value.state.get_magnitude().count
+
+    # Counts are Python ints, so a bulk step on a count of n bits costs O(n).  One
+    # step is charged per bits_per_step bits of the result's count on top of the call.
+    bits_per_step = 4096
+
+    @staticmethod
+    def _sized(steps, digits_log2):
+        return steps * (1 + max(digits_log2, 0.0) / CostEstimator.bits_per_step)
+
+    @staticmethod
+    def _power_steps(digits_log2):
+        # Squaring walks the bits of each multiplier, which grow up to the result's
+        digits_log2 = max(digits_log2, 1.0)
+        return CostEstimator._sized(2 * digits_log2 * max(math.log2(digits_log2), 1.0), digits_log2)
+
+    estimators = {
+        "inc": lambda a, b: CostEstimate(_log2(a + 1), 1),
+        "dec": lambda a, b: CostEstimate(_log2(a + 1), 1),
+        "add": lambda a, b: CostEstimate(_log2(a + b), 1),
+        "sub": lambda a, b: CostEstimate(_log2(a + b), 1),
+        "mul": lambda a, b: CostEstimate(_log2(a) + _log2(b),
+                                         CostEstimator._sized(max(b.bit_length(), 1), _log2(a) + _log2(b))),
+        "div": lambda a, b: CostEstimate(_log2(a), CostEstimator._sized(
+            2 * max(a.bit_length() - b.bit_length() + 1, 1), _log2(a))),
+        "pow": lambda a, b: CostEstimate(_hyper_log2(3, a, b),
+                                         CostEstimator._power_steps(_hyper_log2(3, a, b))),
+        "tetr": lambda a, b: CostEstimate(_hyper_log2(4, a, b),
+                                          CostEstimator._power_steps(_hyper_log2(4, a, b))),
+        "pent": lambda a, b: CostEstimate(_hyper_log2(5, a, b),
+                                          CostEstimator._power_steps(_hyper_log2(5, a, b))),
+        "hexa": lambda a, b: CostEstimate(_hyper_log2(6, a, b),
+                                          CostEstimator._power_steps(_hyper_log2(6, a, b))),
+        "log": lambda a, b: CostEstimate(_log2(a.bit_length()),
+                                         CostEstimator._power_steps(_log2(a))),
+        "superlog": lambda a, b: CostEstimate(_log2(a.bit_length()),
+                                              CostEstimator._power_steps(_log2(a)))
+    }
+
+    def estimate(self, name, number, operand):
+        # None when the operands aren't both Numbers, e.g. Variables
+        if not isinstance(number, Number) or not isinstance(operand, Number):
+            return None
+        if (name in ("log", "superlog") and isinstance(number, Tower) and number._materialized is None
+                and number._grows() and number._same_base(operand)):
+            # Answered from the base and height, and a log stays a lazy Tower
+            return CostEstimate(_log2(number.height.state.get_magnitude().count), 1)
+        a = self._count(number)
+        b = self._count(operand)
+        if a is None or b is None:
+            return CostEstimate(math.inf, math.inf)
+        # Results are kept in the first operand's storage
+        storage = number.base if isinstance(number, Tower) and number._materialized is None else number
+        return self.estimators[name](a, b).stored_in(storage.state.get_magnitude())
+
+    def allows(self, name, number, operand):
+        estimate = self.estimate(name, number, operand)
+        if estimate is None:
+            return True
+        return estimate.nbytes <= self.max_nbytes and estimate.steps <= self.max_steps
+
+    def check(self, name, number, operand):
+        if self.allows(name, number, operand):
+            return
+        estimate = self.estimate(name, number, operand)
+        message = (f"{name} is predicted to take {estimate.nbytes} bytes and {estimate.steps} steps, "
+                   f"past the limits of {self.max_nbytes} bytes and {self.max_steps} steps")
+        if self.action == "raise":
+            raise CostExceeded(message)
+        warnings.warn(message, ResourceWarning)
+
+
+class OperationCache:
+    """
+    A bounded least recently used cache of operator results.
+    Entries are keyed by (operator name, operands), which relies on the operands
+    hashing by value.  Unhashable operands are simply computed without caching.
+    A maxsize of 0 turns caching off.
+    """
+    def __init__(self, maxsize=1024):
+        if maxsize < 0:
+            raise Exception("The cache size limit can't be negative")
+        self.maxsize = maxsize
+        self._results = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def apply(self, name, number, operand):
+        key = (name, number, operand)
+        try:
+            result = self._results[key]
+        except KeyError:
+            pass
+        except TypeError:
+            # Unhashable operands
+            return self._compute(name, number, operand)
+        else:
+            self._results.move_to_end(key)
+            self.hits += 1
+            return result
+        self.misses += 1
+        result = self._compute(name, number, operand)
+        if self.maxsize > 0:
+            self._results[key] = result
+            if len(self._results) > self.maxsize:
+                self._results.popitem(last=False)
+        return result
+
+    @staticmethod
+    def _compute(name, number, operand):
+        # Look the method up on the number, so subclasses like Tower use their own
+        return getattr(number, Operator.operators[name].__name__)(operand)
+
+    def resize(self, maxsize):
+        if maxsize < 0:
+            raise Exception("The cache size limit can't be negative")
+        self.maxsize = maxsize
+        while len(self._results) > maxsize:
+            self._results.popitem(last=False)
+
+    def clear(self):
+        self._results.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self):
+        return {"hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._results),
+                "maxsize": self.maxsize}
+
+
 class Operator:
+    __slots__ = ('name',)
+
     operators = {
         "inc": Number.inc,
         "add": Number.add,
         "mul": Number.mul,
         "pow": Number.pow,
         "tetr": Number.tetr,
+        "pent": Number.pent,
+        "hexa": Number.hexa,
         "dec": Number.dec,
         "sub": Number.sub,
         "div": Number.div,
@@ -32,14 +284,22 @@ class Operator:
         "mul": "*",
         "pow": "^",
         "tetr": "^^",
+        "pent": "^^^",
+        "hexa": "^^^^",
         "sub": "-",
         "div": "/",
         "log": "log",
         "superlog": "slog"
     }
 
+    # Results of every operator are shared through one LRU cache, and every
+    # operation is checked against the cost estimator before it runs
+    cache = OperationCache()
+    estimator = CostEstimator()
+
     def apply(self, number, expression):
-        return self.operators[self.name](number, expression)
+        self.estimator.check(self.name, number, expression)
+        return self.cache.apply(self.name, number, expression)
 
     def __init__(self, operator):
         self.name = operator
@@ -47,18 +307,57 @@ class Operator:
     def compare(self, operator):
         return "equal" if self.name == operator.name else "not equal"
 
+    # Operators are equal by name, so interned Operations can key on them
+    def __eq__(self, other):
+        if not isinstance(other, Operator):
+            return NotImplemented
+        return self.name == other.name
+
+    def __hash__(self):
+        return hash((Operator, self.name))
+
     def repr_standard(self):
         return self.standard_map[self.name]
 
 
 class Operation:
-    def __init__(self, operator, expression):
+    """
+    An operator and the Expression it applies, interned like Expression nodes.
+    """
+    __slots__ = ('_operator', '_expression', '__weakref__')
+
+    _interned = weakref.WeakValueDictionary()
+
+    def __new__(cls, operator, expression):
         if not isinstance(operator, Operator):
             raise Exception("The first param of Operation must be an Operator")
         if not isinstance(expression, Expression):
             raise Exception("The second param of Operation must be an Expression")
-        self.operator = operator
-        self.expression = expression
+        key = (operator, expression)
+        operation = cls._interned.get(key)
+        if operation is None:
+            operation = super().__new__(cls)
+            operation._operator = operator
+            operation._expression = expression
+            cls._interned[key] = operation
+        return operation
+
+    @property
+    def operator(self):
+        return self._operator
+
+    @property
+    def expression(self):
+        return self._expression
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __reduce__(self):
+        return Operation, (self._operator, self._expression)
 
     def compare(self, operation2):
         if self.operator.name != operation2.operator.name:
@@ -75,6 +374,8 @@ class Operation:
 
 
 class Variable:
+    __slots__ = ('_symbol',)
+
     def __init__(self, symbol):
         self._symbol = symbol
 
@@ -83,6 +384,14 @@ class Variable:
             return "equal"
         return "not equal"
 
+    def __eq__(self, other):
+        if not isinstance(other, Variable):
+            return NotImplemented
+        return self._symbol == other._symbol
+
+    def __hash__(self):
+        return hash((Variable, self._symbol))
+
     def repr_standard(self):
         return self._symbol
 
@@ -104,13 +413,47 @@ class Expression:
                 (Variable, Operation=(mul, (Number, (Operator, Expression)))))
                     (Variable, Operation=(mul, (Number, (add, Variable)))))
                     ('X', Operation=(mul, (three, (add, 'X')))))
+
+    Expressions are immutable and hash-consed: building a node equal to one that
+    already exists returns the existing node, so equal chains share their nodes.
+    Values are matched by value, Numbers included, and operations by identity
+    of the interned node they lead to.  chain, subst and simplify path copy,
+    building new nodes only up to the last one that changed and sharing the rest.
     """
-    def __init__(self, value, operation=None):
-        self.value = value
-        self.operation = operation
+    __slots__ = ('_value', '_operation', '__weakref__')
+
+    _interned = weakref.WeakValueDictionary()
+
+    def __new__(cls, value, operation=None):
+        key = (type(value), value, operation)
+        expression = cls._interned.get(key)
+        if expression is None:
+            expression = super().__new__(cls)
+            expression._value = value
+            expression._operation = operation
+            cls._interned[key] = expression
+        return expression
+
+    @property
+    def value(self):
+        return self._value
 
+    @property
+    def operation(self):
+        return self._operation
+
+    # Immutable, so copies are the node itself
     def copy(self):
-        return copy.deepcopy(self)
+        return self
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __reduce__(self):
+        return Expression, (self._value, self._operation)
 
     def tail(self):
         curr_expr = self
@@ -121,116 +464,160 @@ class Expression:
                 break
         return curr_expr
 
+    def _spine(self):
+        # The nodes of the chain, from this one to the tail
+        nodes = [self]
+        while nodes[-1].operation is not None:
+            nodes.append(nodes[-1].operation.expression)
+        return nodes
+
+    @staticmethod
+    def _terms(spine):
+        # The chain as (value, operator) pairs, the tail's operator is None
+        return [(node.value, None if node.operation is None else node.operation.operator)
+                for node in spine]
+
+    @staticmethod
+    def _rebuild(spine, terms):
+        # The chain for terms, reusing the longest tail of spine it still ends with
+        shared = 0
+        while shared < min(len(spine), len(terms)):
+            value, operator = terms[-1 - shared]
+            node = spine[-1 - shared]
+            if value is not node.value or operator != (None if node.operation is None
+                                                       else node.operation.operator):
+                break
+            shared += 1
+        expression = spine[-shared] if shared else None
+        for value, operator in reversed(terms[:len(terms) - shared]):
+            expression = Expression(value, None if operator is None else Operation(operator, expression))
+        return expression
 
     def chain(self, operation):
-        self.tail().operation = operation
-        new_exp = Expression(self.value, None)
-        new_exp.tail().operation = operation
-        return new_exp
+        spine = self._spine()
+        terms = self._terms(spine)
+        expression = Expression(terms[-1][0], operation)
+        for value, operator in reversed(terms[:-1]):
+            expression = Expression(value, Operation(operator, expression))
+        return expression
 
     def subst(self, var, replacement):
         #  Allows for substitution of a variable with another variable or number
-        curr_term = self_copy = self.copy()
-        # Go through operation chain and replace matching vars
-        while True:
-            if isinstance(curr_term.value, Variable):
-                if curr_term.value.compare(var):
-                    curr_term.value = replacement
-            if isinstance(curr_term.value, Expression):
-                curr_term.value.subst(var, replacement)
-            elif curr_term.operation is None:
-                break
-            if isinstance(curr_term.operation.expression, Expression):
-                curr_term = curr_term.operation.expression
-        return self_copy
+        spine = self._spine()
+        terms = self._terms(spine)
+        for index, (value, operator) in enumerate(terms):
+            if isinstance(value, Variable):
+                if value.compare(var) == "equal":
+                    terms[index] = (replacement, operator)
+            elif isinstance(value, Expression):
+                terms[index] = (value.subst(var, replacement), operator)
+        return self._rebuild(spine, terms)
+
+    # Operators computed in place on two Numbers, when the estimator allows it
+    numeric = {"add", "mul", "pow", "tetr", "pent", "hexa", "sub"}
+    # X op X = X op' 2, one rank up
+    promoters = {"add": "mul",
+                 "mul": "pow",
+                 "pow": "tetr",
+                 "tetr": "pent",
+                 "pent": "hexa"}
+    # X op X = constant
+    identities = {"sub": n_.zero,
+                  "div": n_.one}
+
+    # Rules for collapsing a value, operator and the next value, as the types of
+    # both values, a test and the terms that replace the pair.  There are one or
+    # two replacement terms and the last one's operator is None, as it keeps the
+    # operator that followed the pair.
+    rules = [
+        ((Number, Number),
+         lambda a, operator, b: (operator.name in Expression.numeric and
+                                 Operator.estimator.allows(operator.name, a, b)),
+         lambda a, operator, b: [(operator.apply(a, b), None)]),
+        ((Variable, Variable),
+         lambda a, operator, b: operator.name in Expression.promoters and a == b,
+         lambda a, operator, b: [(a, Operator(Expression.promoters[operator.name])), (n_.two, None)]),
+        ((Variable, Variable),
+         lambda a, operator, b: operator.name in Expression.identities and a == b,
+         lambda a, operator, b: [(Expression.identities[operator.name], None)]),
+    ]
+
+    @classmethod
+    def _rule(cls, value1, operator, value2):
+        # The replacement for the first rule that applies, None when none does
+        for (type1, type2), applies, replacement in cls.rules:
+            if isinstance(value1, type1) and isinstance(value2, type2) and applies(value1, operator, value2):
+                return replacement
+        return None
 
     @staticmethod
     def can_collapse(value1, operator, value2):
-        if isinstance(value1, Number):
-            if isinstance(value2, Number):
-                if operator.name in ["add", "mul", "pow", "tetr", "sub"]:
-                    return True
-        if isinstance(value1, Variable):
-            if isinstance(value2, Variable):
-                if value1.compare(value2):
-                    match operator.name:
-                        case "add" | "mul" | "pow" | "sub" | "div" :
-                            return True
-                    return False
-        return False
-
+        return Expression._rule(value1, operator, value2) is not None
 
     @staticmethod
     def collapse(first_value, operator, next_value):
-        # Apply operators to numbers that result in the same output size, e.g.
-        #  add, mul, pow, tetr, sub
-        if isinstance(first_value, Number):
-            if operator.name in ["add", "mul", "pow", "tetr", "sub"]:
-                return operator.apply(first_value, next_value)
-        # Collapse variables
-        if isinstance(first_value, Variable):
-            promoters = {"add": "mul",
-                         "mul": "pow",
-                         "pow": "tetr"}
-            if operator.name in promoters:
-                new_operator = Operator(promoters[operator.name])
-                return Expression(first_value, None).chain(Operation(new_operator, Expression(n_.two)))
-            else:
-                # otherwise it is an identity
-                idents = {"sub": n_.zero,
-                          "div": n_.one,
-                          "log": n_.one}
-                return Expression(idents[operator.name])
-        raise Exception("Collapse called on non-collapsable elements")
-
+        # A single replacement term comes back as its value, two as an Expression
+        replacement = Expression._rule(first_value, operator, next_value)
+        if replacement is None:
+            raise Exception("Collapse called on non-collapsable elements")
+        terms = replacement(first_value, operator, next_value)
+        if len(terms) == 1:
+            return terms[0][0]
+        return Expression._rebuild([], terms)
 
     def simplify(self):
-        # Evaluation simplifies chains of terms using algebraic rules.
-        # First pass adds and multiplies all adjacent numbers.
-        # We'll also count the number of variables in case there are none left.
-
-        curr_exp = self_copy = self.copy()
-        next_operation = None
-
-        while True:
-            # If no operation, we're done
-            if curr_exp.operation is None:
-                break
-            # Look for and collapse adjacent numeric operations
-            if curr_exp.operation.expression is None:
-                raise Exception("Error! Operation has no expression.")
-            # Get the next expression to check for possible simplification
-            next_exp = curr_exp.operation.expression
-            next_operation = next_exp.operation
-            if self_copy.can_collapse(curr_exp.value, curr_exp.operation.operator, next_exp.value):
-                result = self_copy.collapse(curr_exp.value, curr_exp.operation.operator, next_exp.value)
-                # We've got the replacement for the current node.
-                # Now replace the parent operation to point to the new collpased expression
-                if isinstance(result, Expression):
-                    # When an expression is returned, we'll have a new expression formed
-                    # in the chain to plug it in, e.g.
-                    # x.add(x).mul(3) will collapse to
-                    # x.mul(2).mul(3)
-                    curr_exp.operation = result.operation
-                    curr_exp.operation.expression.operation = next_operation
-                else:
-                    curr_exp.operation = next_operation
-                    curr_exp.value = result
-                # since we had a collapse, reset to begin and try again
-                curr_exp = self_copy
+        # Evaluation simplifies chains of terms using the rules table, always
+        # collapsing the leftmost pair that a rule applies to.
+        # The terms are kept as a linked list, and after a collapse only the pairs
+        # next to it are checked again.  The pairs waiting to be checked are a
+        # heap by position in the chain, so the leftmost comes out first.
+        spine = self._spine()
+        terms = self._terms(spine)
+        values = [value for value, _ in terms]
+        operators = [operator for _, operator in terms]
+        after = list(range(1, len(terms))) + [None]
+        before = [None] + list(range(len(terms) - 1))
+        removed = [False] * len(terms)
+        # Replacement terms reuse the slots of the pair, so slot order is chain order
+        dirty = list(range(len(terms) - 1))
+        while dirty:
+            first = heapq.heappop(dirty)
+            second = after[first]
+            if removed[first] or second is None:
+                continue
+            replacement = self._rule(values[first], operators[first], values[second])
+            if replacement is None:
                 continue
-            if next_operation is None:
-                break  # No more operations, so we've reached the end
-            # We weren't able to collapse the current and next values, so march onward!
-            if isinstance(next_operation.expression, Expression):
-                curr_exp = next_operation.expression
+            replaced = replacement(values[first], operators[first], values[second])
+            if len(replaced) == 1:
+                values[first] = replaced[0][0]
+                operators[first] = operators[second]
+                removed[second] = True
+                after[first] = after[second]
+                if after[first] is not None:
+                    before[after[first]] = first
+            elif len(replaced) == 2:
+                values[first], operators[first] = replaced[0]
+                values[second] = replaced[1][0]
+                heapq.heappush(dirty, second)
             else:
-                curr_exp = next_operation.value
-        return self_copy
+                raise Exception("A collapse rule must give one or two terms")
+            heapq.heappush(dirty, first)
+            if before[first] is not None:
+                heapq.heappush(dirty, before[first])
+        simplified = []
+        index = 0
+        while index is not None:
+            simplified.append((values[index], operators[index]))
+            index = after[index]
+        return self._rebuild(spine, simplified)
 
     def compare(self, expr2):
         if not isinstance(expr2, Expression):
             raise Exception("You can only compare an expression to another expression")
+        # Equal expressions are interned to the same node
+        if self is expr2:
+            return "equal"
 
         # Compare types of expression components
         if not isinstance(self, type(expr2)):
@@ -320,6 +707,117 @@ def expression_unit_test():
     ex_x = ex_x.chain(Operation(Operator("add"), ex_2times_ex_xadd1))
     print(ex_x.repr_standard())
 
+    # Higher ranks collapse like the others... 2 ^^^ 3 = 2 ^^ 4 = 65536
+    ex = Expression(n_.two, Operation(Operator("pent"), Expression(n_.three)))
+    print(ex.repr_standard())
+    assert_equal(ex.simplify().value.repr_standard(), "65536")
+    # X ^^ X = X ^^^ 2
+    ex = Expression(Variable("X"), Operation(Operator("tetr"), Expression(Variable("X"))))
+    ex2 = Expression(Variable("X"), Operation(Operator("pent"), Expression(n_.two)))
+    assert_val_equal(ex.simplify().compare(ex2))
+
+    # Equal expressions are the same node, and nodes can't be changed
+    ex = Expression(Number.from_int(1000), Operation(Operator("add"), Expression(Variable("X"))))
+    assert ex is Expression(Number.from_int(1000), Operation(Operator("add"), Expression(Variable("X"))))
+    saw_exception = False
+    try:
+        ex.value = n_.one
+    except AttributeError:
+        saw_exception = True
+    assert saw_exception
+    # Substitution builds new nodes down to the last change and shares the rest
+    ex = Expression(Variable("X"), Operation(Operator("add"), Expression(n_.one)))
+    for _ in range(2000):
+        ex = Expression(n_.two, Operation(Operator("mul"), ex))
+    ex = Expression(Variable("Y"), Operation(Operator("add"), ex))
+    replaced = ex.subst(Variable("Y"), n_.three)
+    assert replaced.operation.expression is ex.operation.expression
+    assert ex.subst(Variable("Z"), n_.three) is ex
+    assert_equal(ex.subst(Variable("X"), n_.three).tail().value.repr_standard(), "1")
+    # Only the matching variable is replaced, and different variables don't collapse
+    ex = Expression(Variable("X"), Operation(Operator("add"), Expression(Variable("Y"))))
+    assert_equal(ex.subst(Variable("X"), n_.one).repr_standard(), "1 + Y")
+    assert_val_equal(ex.simplify().compare(ex))
+
+    # Every adjacent pair gets checked, X + 1 + 2 + 3 = X + 6
+    ex = Expression(Variable("X"), Operation(Operator("add"), Expression(n_.one, Operation(
+        Operator("add"), Expression(n_.two, Operation(Operator("add"), Expression(n_.three)))))))
+    assert_equal(ex.simplify().repr_standard(), "X + 6")
+    # Identities replace the pair with a constant, which collapses further
+    # X - X + 3 = 0 + 3 = 3
+    ex = Expression(Variable("X"), Operation(Operator("sub"), Expression(Variable("X"), Operation(
+        Operator("add"), Expression(n_.three)))))
+    assert_equal(ex.simplify().repr_standard(), "3")
+    # 2 * X / X = 2 * 1 = 2
+    ex = Expression(n_.two, Operation(Operator("mul"), Expression(Variable("X"), Operation(
+        Operator("div"), Expression(Variable("X"))))))
+    assert_equal(ex.simplify().repr_standard(), "2")
+    # Long chains only recheck the neighbours of each collapse
+    ex = Expression(n_.one)
+    for _ in range(5000):
+        ex = Expression(n_.one, Operation(Operator("add"), ex))
+    assert_equal(Expression(Variable("X"), Operation(Operator("mul"), ex)).simplify().repr_standard(), "X * 5001")
+
+    # Every operator has a cost estimate
+    assert_equal(set(CostEstimator.estimators), set(Operator.operators))
+    estimator = CostEstimator()
+    assert_equal(estimator.estimate("mul", n_.eight, n_.four).digits_log2, 5.0)
+    assert_equal(estimator.estimate("tetr", n_.two, n_.four).digits_log2, 16.0)
+    assert estimator.allows("tetr", n_.two, n_.four)
+    # Backends that keep every digit are sized by their own nbytes_for
+    class ByteMagnitude(Magnitude):
+        @staticmethod
+        def nbytes_for(count):
+            return count
+    bytewise = Number(NumberState(ByteMagnitude(2 ** 20), Sign.pos))
+    assert_equal(estimator.estimate("mul", bytewise, Number.from_int(2 ** 22)).nbytes, 2 ** 42)
+    assert not estimator.allows("mul", bytewise, Number.from_int(2 ** 22))
+    packed = Number(NumberState(PackedMagnitude(2 ** 20), Sign.pos))
+    assert_equal(estimator.estimate("mul", packed, Number.from_int(2 ** 22)).nbytes, 2 ** 39)
+    assert not estimator.allows("mul", packed, Number.from_int(2 ** 22))
+    assert estimator.allows("mul", Number.from_int(2 ** 20), Number.from_int(2 ** 22))
+    # Each squaring step costs more as the count grows, so 2^(10^6) is refused
+    assert estimator.allows("pow", n_.two, Number.from_int(10 ** 5))
+    assert not estimator.allows("pow", n_.two, Number.from_int(10 ** 6))
+    # log and superlog of a lazy tower of the same base answer from its height
+    tower = n_.two.tetr(n_.six, lazy=True)
+    assert_val_equal(Operator("superlog").apply(tower, n_.two)[0].compare(n_.six))
+    assert_equal(Operator("log").apply(tower, n_.two)[0].repr_standard(), "2 ^^ 5")
+    assert tower._materialized is None
+    # 2 ^^ 6 would take far more than the default limits, so it is refused up front
+    saw_exception = False
+    try:
+        Operator("tetr").apply(n_.two, n_.six)
+    except CostExceeded:
+        saw_exception = True
+    assert saw_exception
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter("always")
+        CostEstimator(action="warn").check("pent", n_.three, n_.three)
+    assert_equal(caught[0].category, ResourceWarning)
+    # Simplify leaves a collapse that is too expensive as it is
+    ex = Expression(n_.two, Operation(Operator("tetr"), Expression(n_.six)))
+    assert_val_equal(ex.simplify().compare(ex))
+
+    # Operator results are cached by value
+    cache = OperationCache(maxsize=2)
+    assert_val_equal(cache.apply("mul", n_.two, n_.three).compare(n_.six))
+    assert_val_equal(cache.apply("mul", n_.one.add(n_.one), n_.three).compare(n_.six))
+    assert_equal(cache.stats(), {"hits": 1, "misses": 1, "size": 1, "maxsize": 2})
+    # The least recently used entry is dropped once the limit is reached
+    cache.apply("add", n_.two, n_.three)
+    cache.apply("pow", n_.two, n_.three)
+    cache.apply("mul", n_.two, n_.three)
+    assert_equal(cache.stats()["misses"], 4)
+    assert_equal(cache.stats()["size"], 2)
+    cache.resize(1)
+    assert_equal(cache.stats()["size"], 1)
+    # Lazy towers are cached by base and height, and keep their own shortcuts
+    tower = n_.two.tetr(n_.six, lazy=True)
+    assert_val_equal(cache.apply("superlog", tower, n_.two)[0].compare(n_.six))
+    assert_val_equal(cache.apply("superlog", n_.two.tetr(n_.six, lazy=True), n_.two)[0].compare(n_.six))
+    assert tower._materialized is None
+
 
 if __name__ == "__main__":
     expression_unit_test()
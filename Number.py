@@ -1,8 +1,10 @@
 """
 The following is a class and set of unit tests related to Hyperoperation.
 A number class is implemented with a unary representation.
-It implements increment/succession via python list addition of a single value.
-Higher order operations are layered above up to and including tetration/hyper-4.
+It implements increment/succession by adding a single digit to a unary magnitude,
+which stores its digits as a count rather than as a python list.
+Higher order operations are layered above up to and including tetration/hyper-4,
+and Number.hyper builds any rank above that from the ones below it.
 
 Notes about implementation:
 * after inc, (add,mul,pow,tetr) are extremely similar with the exception of their
@@ -13,7 +15,12 @@ https://en.wikipedia.org/wiki/Hyperoperation
 """
 from enum import Enum
 from enum import auto
-import copy
+import itertools
+import math
+import mmap
+import tempfile
+import threading
+import time
 
 
 class UnderflowError(ArithmeticError):
@@ -28,10 +35,12 @@ class ComplexUnimplemented(ArithmeticError):
     pass
 
 class Value:
-    pass
+    __slots__ = ()
 
 
 class Special(Value):
+    __slots__ = ('stype',)
+
     class special_types(Enum):
         any = auto()
         any_even = auto()
@@ -51,42 +60,372 @@ class Special(Value):
         return "not equal"
 
 
-# Helper with predefined numbers
+class SmallNumbers:
+    """
+    An interning table of small Numbers, one shared instance per integer in [low, high].
+
+    Entries are built on first use and never change afterwards, so they are handed
+    out as is instead of being copied.  Number.from_int is the constructor that
+    reads from it, and PreDefs names a few of its entries.
+    """
+
+    def __init__(self, low=-1, high=255):
+        self.resize(low, high)
+
+    def resize(self, low, high):
+        if low > 0 or high < 0:
+            raise Exception("The small number range must include zero")
+        self.low = low
+        self.high = high
+        self._table = {}
+
+    def covers(self, value):
+        return self.low <= value <= self.high
+
+    def get(self, value):
+        if not self.covers(value):
+            raise Exception(f"{value} is outside the small number range [{self.low}, {self.high}]")
+        number = self._table.get(value)
+        if number is None:
+            sign = Sign.neg if value < 0 else Sign.pos
+            number = self._table[value] = Number(NumberState(Magnitude(abs(value)), sign))
+        return number
+
+
+# Helper with predefined numbers, a thin view over the small number table
 class PreDefs:
-    __shared_state = {}
-    def __init__(self):
-        self.__dict__ = self.__shared_state
-        self.zero = Number()
-        self.one = self.zero.inc()
-        self.two = self.one.inc()
-        self.three = self.one.add(self.two)
-        self.four = self.two.add(self.two)
-        self.five = self.two.add(self.three)
-        self.six = self.three.add(self.three)
-        self.six = self.three.add(self.three)
-        self.seven = self.three.add(self.four)
-        self.eight = self.four.add(self.four)
-        self.nine = self.five.add(self.four)
-        self.ten = self.five.add(self.five)
-
-        self.neg_one = Number(self.one, Sign.neg)
-
-        self.any = Special(Special.special_types.any)
-        self.any_even = Special(Special.special_types.any_even)
-        self.any_odd = Special(Special.special_types.any_odd)
-        self.pos_even_not_zero = Special(Special.special_types.pos_even_not_zero)
+    names = {
+        "neg_one": -1,
+        "zero": 0,
+        "one": 1,
+        "two": 2,
+        "three": 3,
+        "four": 4,
+        "five": 5,
+        "six": 6,
+        "seven": 7,
+        "eight": 8,
+        "nine": 9,
+        "ten": 10
+    }
+
+    any = Special(Special.special_types.any)
+    any_even = Special(Special.special_types.any_even)
+    any_odd = Special(Special.special_types.any_odd)
+    pos_even_not_zero = Special(Special.special_types.pos_even_not_zero)
+
+    def __getattr__(self, name):
+        if name not in self.names:
+            raise AttributeError(f"PreDefs has no number named {name}")
+        return Number.from_int(self.names[name])
+
+
+class Magnitude:
+    """
+    A unary magnitude that keeps its digits as a count instead of a list of 'x'.
+
+    It still behaves like the list it replaces: it can be measured with len(),
+    iterated (one 'x' per digit), indexed and sliced, so the unary algorithms
+    above it keep working while only costing O(1) memory per value.
+    len() is limited to sys.maxsize, so code that may see huge values reads count.
+
+    A Magnitude is immutable. Every operation returns a new one, so states and
+    clones share it freely and readers never need to take a copy.
+    """
+    __slots__ = ('_count',)
+
+    digit = 'x'
+
+    def __init__(self, count=0):
+        if count < 0:
+            raise UnderflowError("A magnitude cannot have fewer than zero digits")
+        self._count = count
+
+    def _resized(self, count):
+        # A magnitude of count digits in the same storage as this one.
+        # Every operation builds its result through here, so other storage
+        # backends only need to override this (and how they read digits).
+        return Magnitude(count)
+
+    @property
+    def count(self):
+        return self._count
+
+    def __len__(self):
+        return self._count
+
+    def __iter__(self):
+        return itertools.repeat(self.digit, self._count)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(self._count)
+            if step > 0:
+                return self._resized(max(0, (stop - start + step - 1) // step))
+            return self._resized(max(0, (start - stop - step - 1) // -step))
+        if not -self._count <= index < self._count:
+            raise IndexError("Magnitude index out of range")
+        return self.digit
+
+    def succ(self):
+        # The unary successor, one more digit
+        return self._resized(self._count + 1)
+
+    def extend(self, other):
+        # Concatenate the digits of both magnitudes in one step
+        return self._resized(self._count + other.count)
+
+    def double(self):
+        return self.extend(self)
+
+    def halve(self):
+        # Split the digits into two equal halves, returning one half and the
+        # digit left over when the count is odd
+        return self._resized(self._count // 2), self._resized(self._count % 2)
+
+    def trim(self, other):
+        # Remove as many digits as other holds in one step
+        if other.count > self._count:
+            raise UnderflowError("Cannot trim more digits than a magnitude holds")
+        return self._resized(self._count - other.count)
+
+    def compare(self, comparand):
+        # Three-way comparison of digit counts, no walking of the digits needed
+        if self._count > comparand.count:
+            return "greater"
+        if self._count < comparand.count:
+            return "less"
+        return "equal"
+
+    @property
+    def nbytes(self):
+        return self.nbytes_for(self._count)
+
+    @staticmethod
+    def nbytes_for(count):
+        # Storage taken by count digits, which for a count is the bytes of the count
+        return (count.bit_length() + 7) // 8
+
+    @staticmethod
+    def pow_nbytes(base, exponent):
+        # An upper bound on the nbytes of base^exponent, without computing it.
+        # bit_length overestimates log2 by less than one bit, so for a base of at
+        # least two this is at most twice the real size.
+        return (exponent.count * base.count.bit_length() + 7) // 8
+
+    # Immutable, so copies are structurally shared
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    # Pickles as its count, so sending a magnitude to another process is O(1)
+    def __reduce__(self):
+        return Magnitude, (self._count,)
+
+
+class _DigitFile:
+    """
+    A temporary file of unary digits, mapped read only.
+    Digits are only ever appended, a chunk at a time, and every digit is the same,
+    so any number of MappedMagnitudes can share it as prefixes of its digits and
+    any of them can grow it in place.
+    """
+    __slots__ = ('size', '_digit', '_chunk_size', '_file', '_map')
 
+    def __init__(self, size, digit, directory, chunk_size):
+        self._file = tempfile.TemporaryFile(dir=directory, prefix="unary-")
+        self._digit = digit
+        self._chunk_size = chunk_size
+        self._map = None
+        self.size = 0
+        self.grow(size)
+
+    def grow(self, size):
+        # Append digits up to size and map the longer file.  Only the new digits
+        # are written, and prefixes already handed out read the same digits as before.
+        fill = self._digit * self._chunk_size
+        self._file.seek(self.size)
+        written = self.size
+        while written < size:
+            piece = min(self._chunk_size, size - written)
+            self._file.write(fill[:piece])
+            written += piece
+        self._file.flush()
+        old_map = self._map
+        self._map = mmap.mmap(self._file.fileno(), size, access=mmap.ACCESS_READ)
+        if old_map is not None:
+            old_map.close()
+        self.size = size
+
+    def read(self, start, stop):
+        return self._map[start:stop]
+
+    def __del__(self):
+        self._map.close()
+        self._file.close()
+
+
+class MappedMagnitude(Magnitude):
+    """
+    A unary magnitude whose digits live in a memory-mapped file, one byte per digit.
+
+    This keeps magnitudes larger than RAM as real unary digits without swapping:
+    the pages are file backed, and digits are only ever read or written a chunk at
+    a time.  Results that are no longer than an existing file are prefixes of it,
+    so slicing, trimming and halving share the file rather than writing a new one.
+    Longer results append to the file, at least a chunk at a time, so repeated
+    inc only writes each digit once.
+    directory and chunk_size set where the files go and how much is touched at once.
+    """
+    __slots__ = ('_file',)
+
+    digit_byte = b'x'
+    directory = None
+    chunk_size = 1 << 20
+
+    def __init__(self, count=0):
+        super().__init__(count)
+        self._file = None
+        if count > 0:
+            self._file = _DigitFile(count, self.digit_byte, self.directory, self.chunk_size)
+
+    @classmethod
+    def _view(cls, digit_file, count):
+        magnitude = object.__new__(cls)
+        magnitude._count = count
+        magnitude._file = digit_file
+        return magnitude
+
+    def _resized(self, count):
+        if count < 0:
+            raise UnderflowError("A magnitude cannot have fewer than zero digits")
+        if self._file is None:
+            if count == 0:
+                return self._view(None, 0)
+            return self._view(_DigitFile(count, self.digit_byte, self.directory, self.chunk_size), count)
+        if count > self._file.size:
+            self._file.grow(max(count, self._file.size + self.chunk_size))
+        return self._view(self._file, count)
+
+    def chunks(self):
+        # The digits as bytes, at most chunk_size at a time
+        position = 0
+        while position < self._count:
+            stop = min(position + self.chunk_size, self._count)
+            yield self._file.read(position, stop)
+            position = stop
+
+    def __iter__(self):
+        for chunk in self.chunks():
+            yield from chunk.decode()
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return super().__getitem__(index)
+        if not -self._count <= index < self._count:
+            raise IndexError("Magnitude index out of range")
+        index %= self._count
+        return self._file.read(index, index + 1).decode()
+
+    @staticmethod
+    def nbytes_for(count):
+        # One byte per digit
+        return count
+
+    @staticmethod
+    def pow_nbytes(base, exponent):
+        # base^exponent digits, capped where it is far past any disk anyway
+        if exponent.count * base.count.bit_length() > 64:
+            return 1 << 64
+        return base.count ** exponent.count
+
+    def __reduce__(self):
+        # The file stays with this process, others get their own copy of the digits
+        return MappedMagnitude, (self._count,)
+
+
+class PackedMagnitude(Magnitude):
+    """
+    A unary magnitude packed one bit per digit into an immutable bytes buffer.
+
+    A digit is a set bit, so a buffer of all ones holds as many digits as it has
+    bits and any prefix of it is a valid magnitude.  Slicing, trimming and halving
+    are views of the same buffer, and extending past it builds a new one in a
+    single C-level fill.  That is 1/64th of the list of 'x' pointers it replaces.
+    """
+    __slots__ = ('_buffer',)
+
+    def __init__(self, count=0):
+        super().__init__(count)
+        self._buffer = b'\xff' * self.nbytes_for(count)
+
+    @classmethod
+    def _view(cls, buffer, count):
+        magnitude = object.__new__(cls)
+        magnitude._count = count
+        magnitude._buffer = buffer
+        return magnitude
+
+    @property
+    def buffer(self):
+        return self._buffer
+
+    def _resized(self, count):
+        if count < 0:
+            raise UnderflowError("A magnitude cannot have fewer than zero digits")
+        if count <= len(self._buffer) * 8:
+            return self._view(self._buffer, count)
+        return self._view(b'\xff' * self.nbytes_for(count), count)
+
+    def _bit(self, index):
+        return (self._buffer[index >> 3] >> (index & 7)) & 1
+
+    def __iter__(self):
+        for index in range(self._count):
+            if self._bit(index):
+                yield self.digit
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return super().__getitem__(index)
+        if not -self._count <= index < self._count:
+            raise IndexError("Magnitude index out of range")
+        if not self._bit(index % self._count):
+            raise UnderflowError("A packed magnitude lost one of its digits")
+        return self.digit
+
+    @staticmethod
+    def nbytes_for(count):
+        # One bit per digit
+        return (count + 7) // 8
+
+    @staticmethod
+    def pow_nbytes(base, exponent):
+        # base^exponent digits over 8, capped where it is far past any memory anyway
+        if exponent.count * base.count.bit_length() > 64:
+            return 1 << 61
+        return (base.count ** exponent.count + 7) // 8
+
+    def __reduce__(self):
+        # Rebuilding the buffer is cheaper than sending it
+        return PackedMagnitude, (self._count,)
 
 
 class NumberState:
+    __slots__ = ('_magnitude', '_sign')
+
     def __init__(self, magnitude, sign):
         # default state is non-negative zero
         if isinstance(magnitude, Number):
             self._magnitude = magnitude.state.get_magnitude()
-        elif not isinstance(magnitude, list):
-            raise Exception("   NumberState requires either a Number or a Number.integer for the magnitude")
-        else:
+        elif isinstance(magnitude, Magnitude):
             self._magnitude = magnitude
+        elif isinstance(magnitude, list):
+            self._magnitude = Magnitude(len(magnitude))
+        else:
+            raise Exception("   NumberState requires either a Number or a Number.integer for the magnitude")
         self._sign = sign
 
     def clone(self):
@@ -99,17 +438,7 @@ class NumberState:
         self._sign = state._sign
 
     def compare_magnitude(self, comparand):
-        for _ in iter(self.get_magnitude()):
-            try:
-                comparand.get_magnitude()[0]
-                comparand = NumberState(comparand.get_magnitude()[1:], self._sign)
-            except Exception as e:
-                return "greater"
-        try:
-            comparand.get_magnitude()[0]
-            return "less"
-        except:
-            return "equal"
+        return self._magnitude.compare(comparand.get_magnitude())
 
     def compare(self, comparand):
         if not isinstance(comparand, NumberState):
@@ -123,11 +452,15 @@ class NumberState:
 
         return self.compare_magnitude(comparand)
 
+    # Magnitudes are immutable and Signs are enum members, so both are handed out as is
     def get_magnitude(self):
-        return copy.copy(self._magnitude)
+        return self._magnitude
 
     def get_sign(self):
-        return copy.copy(self._sign)
+        return self._sign
+
+    def __reduce__(self):
+        return NumberState, (self._magnitude, self._sign)
 
 
 class Sign(Enum):
@@ -143,6 +476,7 @@ class Number(Value):
     Member functions attempt to be functional in intent, but are implemented in an
     imperative style. (Because that is how I learned how to program?)
     """
+    __slots__ = ('_state',)
 
     def __init__(self, copy_state=None, sign=Sign.pos):
         if not isinstance(sign, Sign):
@@ -161,8 +495,17 @@ class Number(Value):
 
 
 
+    @staticmethod
+    def from_int(value):
+        # Small values come shared from the interning table, others are built fresh
+        if small_numbers.covers(value):
+            return small_numbers.get(value)
+        sign = Sign.neg if value < 0 else Sign.pos
+        return Number(NumberState(Magnitude(abs(value)), sign))
+
     def clone(self):
-        return copy.deepcopy(self)
+        # Magnitudes are immutable, so a clone only needs a state of its own
+        return Number(self, self.state.get_sign())
 
 
     # Use a property to ensure the state is immutable
@@ -175,107 +518,207 @@ class Number(Value):
         # (conscious effort to not use the + operator here even if it
         #  is just a cosmetic distinction)
         # special case 0.  0.inc() is always +1 independent of zero sign
-        if len(self.state.get_magnitude()) == 0:
-            return Number(NumberState(['x'], Sign.pos))
+        if self.state.get_magnitude().count == 0:
+            return Number(NumberState(self.state.get_magnitude().succ(), Sign.pos))
         if self.state.get_sign() == Sign.neg:
             return Number(NumberState(self.state.get_magnitude()[1:], Sign.neg))
-        return Number(NumberState([*self.state.get_magnitude(), 'x'], Sign.pos))
+        return Number(NumberState(self.state.get_magnitude().succ(), Sign.pos))
+
+    def _add_signed(self, magnitude, sign):
+        # Bulk equivalent of applying inc (sign pos) or dec (sign neg) once per digit
+        # of magnitude.  Matching signs concatenate, differing signs trim the smaller
+        # magnitude from the larger, which keeps the larger one's sign.
+        own = self.state.get_magnitude()
+        if magnitude.count == 0:
+            # 0th iteration is identity
+            return self.clone()
+        if self.state.get_sign() == sign:
+            return Number(NumberState(own.extend(magnitude), sign))
+        if magnitude.compare(own) == "greater":
+            return Number(NumberState(magnitude.trim(own), sign))
+        return Number(NumberState(own.trim(magnitude), self.state.get_sign()))
 
     def add(self, b):
         if not isinstance(b, Number):
             raise Exception("You can only add by Numbers!")
-        # 0th iteration is identity
-        result = self.clone()
-        for _ in b.state.get_magnitude():
-            if b.state.get_sign() == Sign.pos:
-                result = result.inc()
-            else:
-                result = result.dec()
-        return result
+        return self._add_signed(b.state.get_magnitude(), b.state.get_sign())
 
     def mul(self, b):
-        # 0th iteration is 0
-        copy_self = self.clone()
         if not isinstance(b, Number):
             raise Exception("You can only mul by Numbers!")
-        result = n_.zero.clone()
-        for _ in b.state.get_magnitude():
-            result = result.add(copy_self)
+        addend = self.state.get_magnitude()
+        # 0th iteration is 0
+        product = addend._resized(0)
+        multiplier = b.state.get_magnitude()
+        # Russian-peasant multiplication: halve the multiplier and double the addend,
+        # adding the addend whenever halving leaves a digit over.
+        # This takes O(log b) bulk additions instead of b of them.
+        while multiplier.count > 0:
+            multiplier, leftover = multiplier.halve()
+            if leftover.count > 0:
+                product = product.extend(addend)
+            addend = addend.double()
         if self._state.get_sign() == b.state.get_sign():
-            result.state._sign = Sign.pos
-        else:
-            result.state._sign = Sign.neg
-        return result
+            return Number(NumberState(product, Sign.pos))
+        return Number(NumberState(product, Sign.neg))
 
     def pow(self, b):
         if not isinstance(b, Number):
             raise Exception("You can only pow by Numbers!")
-        result = n_.one.clone()
-        for _ in b.state.get_magnitude():
-            result = result.mul(self)
+        # 0th iteration is 1
+        result = n_.one
+        square = self
+        exponent = b.state.get_magnitude()
+        # Exponentiation by squaring: halve the exponent and square the base,
+        # multiplying the square in whenever halving leaves a digit over.
+        # This takes O(log b) multiplications instead of b of them.
+        while exponent.count > 0:
+            exponent, leftover = exponent.halve()
+            if leftover.count > 0:
+                # square first, so the result keeps self's magnitude storage
+                result = square.mul(result)
+            if exponent.count > 0:
+                square = square.mul(square)
         if b.state.get_sign() == Sign.neg:
             return n_.one.div(result)
         return result
 
-    def tetr(self, b):
+    def tetr(self, b, lazy=False):
         if not isinstance(b, Number):
             raise Exception("You can only tetr by Numbers!")
-        # Stupid piecewise definition
-        if b.compare(n_.zero) == "equal":
-            # 0th iteration is 1
-            return n_.one
-        result = self.clone()
-        once = True
-        # For the non-zero tetration case, you loop b - 1 times.
-        for _ in b.state.get_magnitude():
-            if once:  # Skip the first so do one less
-                once = False
+        if lazy:
+            # Keep the tower symbolic, digits are only built when asked for
+            return Tower(self, b)
+        return self.hyper(4, b)
+
+    def tetr_levels(self, b=None, budget=None):
+        """
+        Yield each level of the tower self ^^ b as (height, level, digits, elapsed),
+        from height 0 up to b, or without end when b is None.
+
+        digits is the level's digit count and elapsed the seconds since the first
+        level.  A Budget stops the walk cleanly between levels once its time or step
+        limit runs out, when the next level is predicted to need more memory than it
+        allows, or when it is cancelled.  budget.reason then says which.
+        """
+        if b is not None and not isinstance(b, Number):
+            raise Exception("You can only tetr by Numbers!")
+        if budget is None:
+            budget = Budget()
+        budget.start()
+        height = n_.zero
+        level = n_.one
+        while True:
+            yield height, level, level.state.get_magnitude().count, budget.elapsed()
+            if b is not None and height.state.compare_magnitude(b.state) != "less":
+                return
+            if height.compare(n_.zero) == "equal":
+                # 1st iteration is self
+                next_bytes = self.state.get_magnitude().nbytes
+            else:
+                next_bytes = self.state.get_magnitude().pow_nbytes(self.state.get_magnitude(),
+                                                                   level.state.get_magnitude())
+            if not budget.allows(next_bytes):
+                return
+            level = self if height.compare(n_.zero) == "equal" else self.pow(level)
+            height = height.inc()
+
+    def pent(self, b):
+        if not isinstance(b, Number):
+            raise Exception("You can only pent by Numbers!")
+        return self.hyper(5, b)
+
+    def hexa(self, b):
+        if not isinstance(b, Number):
+            raise Exception("You can only hexa by Numbers!")
+        return self.hyper(6, b)
+
+    def hyper(self, rank, b):
+        """
+        The hyperoperation H_rank(self, b) for any integer rank >= 0.
+
+        Ranks 0 to 3 (succession, add, mul and pow) go straight to their kernels.
+        Above that, H_n(a, 0) = 1 and H_n(a, b) = H_n-1(a, H_n(a, b - 1)), i.e.
+        b - 1 applications of the rank below starting from a.  The nesting is kept
+        on an explicit work stack rather than in recursive calls.  As with tetr,
+        only the magnitude of b is used for the higher ranks.
+        """
+        if not isinstance(b, Number):
+            raise Exception("You can only hyper by Numbers!")
+        if rank < 0:
+            raise UndefinedError("Hyperoperations start at rank 0")
+        if rank in self.kernels:
+            return self.kernels[rank](self, b)
+        # Each frame is [rank, applications left, value so far]
+        stack = [[rank, b.state.get_magnitude(), None]]
+        result = None
+        while stack:
+            frame = stack[-1]
+            if result is not None:
+                # The frame above just finished one application for this frame
+                frame[1] = frame[1][1:]
+                frame[2] = result
+                result = None
+            frame_rank, remaining, value = frame
+            if value is None:
+                if remaining.count == 0:
+                    # 0th iteration is 1
+                    stack.pop()
+                    result = n_.one
+                    continue
+                # 1st iteration is self, leaving b - 1 applications of the rank below
+                frame[1] = remaining = remaining[1:]
+                frame[2] = value = self
+            if remaining.count == 0:
+                stack.pop()
+                result = value
                 continue
-            result = result.pow(self)
+            lower = self.kernels.get(frame_rank - 1)
+            if lower is not None:
+                frame[1] = remaining[1:]
+                frame[2] = lower(self, value)
+            else:
+                stack.append([frame_rank - 1, value.state.get_magnitude(), None])
         return result
 
     def dec(self):
-        self_copy = self.clone()
         if self.compare(n_.zero) == "equal":
-            return n_.neg_one.clone()
+            return n_.neg_one
         if self.state.get_sign() == Sign.pos:
             return Number(NumberState(self.state.get_magnitude()[1:], Sign.pos))
         else:
-            return Number(NumberState(Number(self_copy, Sign.pos).inc(), Sign.neg))
+            return Number(NumberState(Number(self, Sign.pos).inc(), Sign.neg))
 
     def sub(self, s):
         if not isinstance(s, Number):
             raise Exception("You can only subtract by Numbers!")
-        result = self.clone()
-        for _ in s.state.get_magnitude():
-            if result.compare(n_.zero) == "equal":
-                # We've exhausted the minuend, so flip the sign and start adding
-                result = Number(NumberState(n_.one._state.get_magnitude(), Sign.neg))
-                continue
-            if s.state.get_sign() == Sign.pos:
-                result = result.dec()
-            else:
-                result = result.inc()
-        return result
+        # Subtraction is addition of the subtrahend with its sign flipped
+        flipped = Sign.neg if s.state.get_sign() == Sign.pos else Sign.pos
+        return self._add_signed(s.state.get_magnitude(), flipped)
 
     def div(self, denominator):
         if not isinstance(denominator, Number):
             raise Exception("You can only divide by Numbers!")
-        numerator = Number(self.clone(), Sign.pos)
-        divisions = n_.zero.clone()
-        if denominator.compare(n_.zero) == "equal":
+        if denominator.state.compare_magnitude(n_.zero.state) == "equal":
             raise ZeroDivisionError()
         sign = Sign.pos if self.state.get_sign() == denominator.state.get_sign() else Sign.neg
+        remainder = self.state.get_magnitude()
+        # Binary long division: line up the denominator doubled as far as it fits
+        # in the numerator, then subtract the multiples back down from the largest,
+        # adding each multiple's weight to the quotient.  O(log) bulk steps.
+        multiples = [(denominator.state.get_magnitude(), remainder._resized(1))]
         while True:
-            progress = n_.zero.clone()
-            if numerator.state.compare_magnitude(n_.zero.state) == "equal":
-                return Number(divisions, sign), progress
-            for _ in denominator.state.get_magnitude():
-                if numerator.state.compare_magnitude(n_.zero.state) == "equal":
-                    return Number(divisions, sign), progress
-                numerator = numerator.dec()
-                progress = progress.inc()
-            divisions = divisions.inc()
+            multiple, weight = multiples[-1]
+            doubled = multiple.double()
+            if doubled.compare(remainder) == "greater":
+                break
+            multiples.append((doubled, weight.double()))
+        quotient = remainder._resized(0)
+        for multiple, weight in reversed(multiples):
+            if multiple.compare(remainder) != "greater":
+                remainder = remainder.trim(multiple)
+                quotient = quotient.extend(weight)
+        return Number(NumberState(quotient, sign)), Number(NumberState(remainder, Sign.pos))
 
     #  This returns (magnitude, mantissa)
     #  But the currently returned mantissa may not be the best representation.
@@ -284,8 +727,6 @@ class Number(Value):
     def log(self, base):
         if not isinstance(base, Number):
             raise Exception("You can only log by base Numbers!")
-        self_copy = self.clone()
-        numerator = self.clone()
         if base.state.compare_magnitude(n_.zero.state) == "equal":
             if self.state.compare_magnitude(n_.zero.state) == "equal":
                 if self.state.get_sign() == Sign.neg:
@@ -306,29 +747,51 @@ class Number(Value):
                 return n_.any_even, n_.zero
             if self.compare(n_.neg_one) == "equal":
                 return n_.any_odd, n_.zero
+            # (-1)^N only ever reaches 1 and -1
+            raise UndefinedError()
         if self.state.compare_magnitude(n_.zero.state) == "equal":
             # For log N for base B other than 0,1 (handled above)
             # given b^x=N  with N=0, there is no value for x where b^x can be 0
             raise UndefinedError()
-        magnitude = n_.zero.clone()
-        while True:
-            if numerator.compare(n_.one) == "equal":
-                remainder = self_copy.sub(base.pow(magnitude))
-                return magnitude, remainder
-            numerator, _ = numerator.div(base)
-            if numerator.state.compare_magnitude(n_.zero.state) == "equal":
-                pow_result = base.pow(magnitude)
-                remainder = self_copy.sub(pow_result)
-                if pow_result.state.get_sign() == Sign.neg:
-                    raise ComplexUnimplemented
-                return magnitude, remainder
-            magnitude = magnitude.inc()
+        magnitude, power = self._floor_log(base)
+        pow_result = power
+        if base.state.get_sign() == Sign.neg and magnitude.state.get_magnitude().halve()[1].count > 0:
+            pow_result = Number(power, Sign.neg)
+        remainder = self.sub(pow_result)
+        # Repeatedly dividing self by base stops cleanly on +1 when self < 2 * |base^magnitude|
+        # and the signs line up.  Otherwise it runs into zero, which a negative power
+        # can't explain without complex numbers.
+        reaches_one = (power.add(power).compare(Number(self, Sign.pos)) == "greater" and
+                       self.state.get_sign() == pow_result.state.get_sign())
+        if not reaches_one and pow_result.state.get_sign() == Sign.neg:
+            raise ComplexUnimplemented
+        return magnitude, remainder
 
+    def _floor_log(self, base):
+        # The largest exponent k with |base|^k <= |self|, and |base|^k itself.
+        # |base| must be at least 2 and |self| at least 1.
+        # squares holds the (|base|^(2^i), 2^i) pairs from repeated squaring, which
+        # the binary search below reuses instead of recomputing powers.
+        target = Number(self, Sign.pos)
+        squares = [(Number(base, Sign.pos), n_.one)]
+        while squares[-1][0].compare(target) != "greater":
+            square, weight = squares[-1]
+            squares.append((square.mul(square), weight.add(weight)))
+        # Binary search over the exponent, from the largest square down
+        exponent = n_.zero
+        power = n_.one
+        for square, weight in reversed(squares):
+            if square.compare(target) == "greater":
+                continue
+            candidate = power.mul(square)
+            if candidate.compare(target) != "greater":
+                power = candidate
+                exponent = exponent.add(weight)
+        return exponent, power
 
     def superlog(self, base):
         if not isinstance(base, Number):
             raise Exception("You can only superlog by base Numbers!")
-        self_copy = self.clone()
         if base.compare(n_.zero) == "equal":
             if self.compare(n_.zero) == "equal":
                 return n_.any, n_.zero
@@ -340,26 +803,299 @@ class Number(Value):
                 else:
                     return n_.any_even, n_.zero
             raise UndefinedError()
-        height = n_.one
-        log_progress = self.clone()
-        curr_base = base
-        while True:
-            log_progress, _ = log_progress.log(curr_base)
-            if log_progress.compare(n_.zero) == "equal":
-                remainder = self_copy.sub(base.tetr(height))
-                return height, remainder
-            height = height.inc()
-            curr_base = curr_base.mul(curr_base)
+        if base.state.compare_magnitude(n_.zero.state) == "equal":
+            raise UndefinedError()
+        if self.state.compare_magnitude(n_.zero.state) == "equal":
+            # No tower reaches zero
+            raise UndefinedError()
+        if base.state.get_sign() == Sign.neg:
+            # Towers of a negative base pass through fractional powers
+            raise ComplexUnimplemented
+        # Walk up the tower levels while they stay within |self|.  The memory budget
+        # stops the walk before building a level that is sure to be larger: a level's
+        # predicted size is at most twice its real size, so anything predicted past
+        # twice the size of |self| can't fit under it.
+        target = Number(self, Sign.pos)
+        target_nbytes = base.state.get_magnitude().nbytes_for(target.state.get_magnitude().count)
+        budget = Budget(memory=2 * target_nbytes + 1)
+        height = n_.zero
+        tower = n_.one
+        for level_height, level, _, _ in base.tetr_levels(budget=budget):
+            if level.compare(target) == "greater":
+                break
+            height = level_height
+            tower = level
+        remainder = self.sub(tower)
+        return height, remainder
 
     def compare(self, b):
         if isinstance(b, Special):
             return "not equal"
         if not isinstance(b, Number):
             raise Exception("You can only compare with Specials and Numbers!")
+        if isinstance(b, Tower) and not isinstance(self, Tower):
+            # Let the tower decide, so it is only built if it has to be
+            return self.inverse[b.compare(self)]
         return self._state.compare(b._state)
 
+    inverse = {"greater": "less", "less": "greater", "equal": "equal", "not equal": "not equal"}
+
+    # Ranks with their own algorithm, which hyper builds the higher ranks on.
+    # Rank 0 is succession of b, H_0(a, b) = b + 1.
+    # They are looked up on the operand, so subclasses and wrapped methods are used.
+    kernels = {
+        0: lambda a, b: b.inc(),
+        1: lambda a, b: a.add(b),
+        2: lambda a, b: a.mul(b),
+        3: lambda a, b: a.pow(b)
+    }
+
+    # Value based equality and hashing, so Numbers can key dicts and caches.
+    # -0 and +0 stay distinct, as they are for compare.
+    def __eq__(self, other):
+        if not isinstance(other, Number) or isinstance(other, Tower):
+            return NotImplemented
+        return self.compare(other) == "equal"
+
+    def __hash__(self):
+        return hash((self.state.get_magnitude().count, self.state.get_sign()))
+
+    # Pickles as its state, which pickles as the magnitude's count and the sign
+    def __reduce__(self):
+        return Number, (self.state,)
+
+    def repr_standard(self):
+        return str(self._state.get_magnitude().count)
+
+class Budget:
+    """
+    Limits for a long running computation, checked between its steps.
+
+    seconds caps the wall clock time, steps the number of steps taken and memory
+    the bytes a step is predicted to need.  A limit of None is unlimited.
+    cancel() stops the computation at its next check, from any thread.  Once a
+    limit stops it, reason names the limit ("seconds", "steps", "memory" or
+    "cancelled").
+    """
+    __slots__ = ('seconds', 'steps', 'memory', 'reason', '_cancelled', '_started', '_taken')
+
+    def __init__(self, seconds=None, steps=None, memory=None):
+        self.seconds = seconds
+        self.steps = steps
+        self.memory = memory
+        self.reason = None
+        self._cancelled = threading.Event()
+        self._started = None
+        self._taken = 0
+
+    def start(self):
+        self.reason = None
+        self._started = time.perf_counter()
+        self._taken = 0
+
+    def elapsed(self):
+        if self._started is None:
+            return 0.0
+        return time.perf_counter() - self._started
+
+    def cancel(self):
+        self._cancelled.set()
+
+    def allows(self, next_bytes=0):
+        # Check the limits before taking one more step
+        if self._cancelled.is_set():
+            self.reason = "cancelled"
+        elif self.seconds is not None and self.elapsed() >= self.seconds:
+            self.reason = "seconds"
+        elif self.steps is not None and self._taken >= self.steps:
+            self.reason = "steps"
+        elif self.memory is not None and next_bytes > self.memory:
+            self.reason = "memory"
+        else:
+            self._taken += 1
+            return True
+        return False
+
+
+class Tower(Number):
+    """
+    A lazy power tower, base ^^ height, kept symbolically.
+
+    Towers grow too fast to build their digits past the first few heights, so a
+    Tower only materializes when its state is read or materialize() is called.
+    compare, log and superlog answer directly from the base and height when
+    the base is a positive number of at least two, where towers strictly grow
+    with height.  compare walks the tower's levels against plain Numbers and
+    only builds towers of other bases that fit in materialize_limit bytes.
+    Anything else falls back to the materialized Number.
+    """
+    __slots__ = ('_base', '_height', '_materialized')
+
+    # Towers bigger than this many bytes are compared through their levels only
+    materialize_limit = 1 << 24
+
+    def __init__(self, base, height):
+        if not isinstance(base, Number) or not isinstance(height, Number):
+            raise Exception("A Tower needs a Number base and a Number height")
+        self._base = base
+        self._height = height
+        self._materialized = None
+
+    @property
+    def base(self):
+        return self._base
+
+    @property
+    def height(self):
+        return self._height
+
+    # All Number operations read the state, which is where the digits get built
+    @property
+    def _state(self):
+        return self.materialize().state
+
+    def materialize(self):
+        if self._materialized is None:
+            self._materialized = self._base.tetr(self._height)
+        return self._materialized
+
+    def clone(self):
+        tower = Tower(self._base, self._height)
+        tower._materialized = self._materialized
+        return tower
+
+    # Copies stay lazy instead of reading (and so building) the state
+    def __copy__(self):
+        return self.clone()
+
+    def __deepcopy__(self, memo):
+        return self.clone()
+
+    # Towers hash and compare equal by base and height, which never builds them.
+    # A Tower is not equal to a plain Number, even one of the same value.
+    def __eq__(self, other):
+        if not isinstance(other, Tower):
+            return False if isinstance(other, Number) else NotImplemented
+        return self._base == other.base and self._height == other.height
+
+    def __hash__(self):
+        return hash((Tower, self._base, self._height))
+
+    # Towers pickle as base and height, so they stay lazy in other processes too
+    def __reduce__(self):
+        return Tower, (self._base, self._height)
+
+    def _grows(self):
+        # Towers of a positive base >= 2 strictly increase with height
+        return (self._base.state.get_sign() == Sign.pos and
+                self._base.state.compare_magnitude(n_.two.state) != "less" and
+                self._height.state.get_sign() == Sign.pos)
+
+    def _same_base(self, base):
+        return isinstance(base, Number) and self._base.compare(base) == "equal"
+
+    def _bounded(self):
+        # The materialized tower, if building it stays under materialize_limit bytes
+        if self._materialized is None:
+            budget = Budget(memory=self.materialize_limit)
+            for _, level, _, _ in self._base.tetr_levels(self._height, budget):
+                pass
+            if budget.reason is not None:
+                return None
+            self._materialized = level
+        return self._materialized
+
+    def _compare_levels(self, b):
+        # Walk up the levels while they stay within b, as superlog does.  The memory
+        # budget stops the walk before a level that is sure to be larger than b, and
+        # the tower only grows past any level.
+        if b.state.get_sign() == Sign.neg:
+            return "greater"
+        target_nbytes = self._base.state.get_magnitude().nbytes_for(b.state.get_magnitude().count)
+        budget = Budget(memory=2 * target_nbytes + 1)
+        for _, level, _, _ in self._base.tetr_levels(self._height, budget):
+            if level.compare(b) == "greater":
+                return "greater"
+        if budget.reason is not None:
+            return "greater"
+        return level.compare(b)
+
+    def _compare_tower(self, b):
+        if self._same_base(b.base):
+            return self._height.compare(b.height)
+        taller = self._height.compare(b.height)
+        if taller == "equal":
+            if self._height.compare(n_.zero) == "equal":
+                return "equal"
+            return self._base.compare(b.base)
+        if self._base.compare(b.base) == taller:
+            # Taller with the larger base
+            return taller
+        # The taller tower has the smaller base, so compare against whichever side
+        # is small enough to build
+        other = b._bounded()
+        if other is not None:
+            return self._compare_levels(other)
+        own = self._bounded()
+        if own is not None:
+            return self.inverse[b._compare_levels(own)]
+        # Both are too big to build, so compare them as towers of twos
+        own, other = self._twos(), b._twos()
+        if own[0] != other[0]:
+            return "greater" if own[0] > other[0] else "less"
+        if not math.isclose(own[1], other[1], rel_tol=1e-12):
+            return "greater" if own[1] > other[1] else "less"
+        return super().compare(b)
+
+    def _twos(self):
+        # The tower as (k, y), a value of 2^2^...^y with k twos.  y is a float that is
+        # at least 1024 once k > 0, so a larger k always means a larger value.  Each
+        # level above the second adds log2 log2 base to an exponent that is already
+        # past 2^1024, which is far below a float's precision, so only the lowest
+        # levels are rounded.
+        log_base = math.log2(self._base.state.get_magnitude().count)
+        k, y = 0, 1.0
+        for _ in range(self._height.state.get_magnitude().count):
+            if k == 0:
+                exponent = y * log_base
+                if exponent < 1024:
+                    y = 2.0 ** exponent
+                else:
+                    k, y = 1, exponent
+            else:
+                if k == 1:
+                    y += math.log2(log_base)
+                k += 1
+        return k, y
+
+    def compare(self, b):
+        if not self._grows() or self._materialized is not None or not isinstance(b, Number):
+            return super().compare(b)
+        if isinstance(b, Tower):
+            if not b._grows():
+                return super().compare(b)
+            if b._materialized is None:
+                return self._compare_tower(b)
+            b = b._materialized
+        return self._compare_levels(b)
+
+    def log(self, base):
+        # log_b(b ^^ h) = b ^^ (h - 1) exactly
+        if self._grows() and self._same_base(base) and self._height.compare(n_.zero) == "greater":
+            return Tower(self._base, self._height.dec()), n_.zero
+        return super().log(base)
+
+    def superlog(self, base):
+        # superlog_b(b ^^ h) = h exactly
+        if self._grows() and self._same_base(base):
+            return Number(self._height), n_.zero
+        return super().superlog(base)
+
     def repr_standard(self):
-        return str(len(self._state.get_magnitude()))
+        return f"{self._base.repr_standard()} ^^ {self._height.repr_standard()}"
+
+
+small_numbers = SmallNumbers()
 
 # short name to reduce clutter
 n_ = PreDefs()
@@ -0,0 +1,185 @@
+"""
+Benchmarks for every hyperoperation and for Expression.simplify.
+
+Each case runs one operation on operands of a given size, timed over several
+repeats.  Results are written as JSON and can be compared with a stored baseline,
+failing (exit code 1) when a case got slower than the baseline by more than the
+tolerance.
+
+    python Number_bench.py --output results.json
+    python Number_bench.py --save-baseline baseline.json
+    python Number_bench.py --baseline baseline.json --tolerance 0.25
+"""
+from Number import Number
+from Number import PreDefs
+from Expression import Expression, Operation, Operator, Variable
+import argparse
+import json
+import platform
+import statistics
+import sys
+import time
+
+
+n_ = PreDefs()
+
+
+def sum_chain(terms):
+    # X + 1 + 2 + ... + terms, which simplify folds down to X + the sum
+    expression = Expression(Number.from_int(terms))
+    for value in range(terms - 1, 0, -1):
+        expression = Expression(Number.from_int(value), Operation(Operator("add"), expression))
+    return Expression(Variable("X"), Operation(Operator("add"), expression))
+
+
+def _simplify(expression):
+    # Start every run from an empty operator cache, so it measures the work and not the cache
+    def run():
+        Operator.cache.clear()
+        return expression.simplify()
+    return run
+
+
+def cases():
+    """
+    Every benchmark case as (name, function).  Operands are built up front, so
+    only the operation itself is timed.
+    """
+    numbers = {size: Number.from_int(10 ** size) for size in (1, 4, 9, 100)}
+    two, three = n_.two, n_.three
+    benchmarks = []
+    for size, number in numbers.items():
+        other = Number.from_int(10 ** size - 7)
+        benchmarks += [
+            (f"inc/10^{size}", number.inc),
+            (f"add/10^{size}", lambda a=number, b=other: a.add(b)),
+            (f"sub/10^{size}", lambda a=number, b=other: a.sub(b)),
+            (f"mul/10^{size}", lambda a=number, b=other: a.mul(b)),
+            (f"div/10^{size}", lambda a=number, b=Number.from_int(7): a.div(b)),
+            (f"log/10^{size}", lambda a=number: a.log(two)),
+            (f"superlog/10^{size}", lambda a=number: a.superlog(two)),
+        ]
+    for exponent in (10, 1000, 100000):
+        benchmarks.append((f"pow/2^{exponent}", lambda b=Number.from_int(exponent): two.pow(b)))
+    benchmarks += [
+        ("tetr/2^^3", lambda: two.tetr(three)),
+        ("tetr/2^^4", lambda: two.tetr(n_.four)),
+        ("tetr/3^^3", lambda: three.tetr(three)),
+        ("superlog/2^^5", lambda tower=two.tetr(n_.five): tower.superlog(two)),
+        # Answered from base and height, without building the tower
+        ("superlog/2^^6-lazy", lambda tower=two.tetr(n_.six, lazy=True): tower.superlog(two)),
+    ]
+    for terms in (10, 100):
+        benchmarks.append((f"simplify/{terms}", _simplify(sum_chain(terms))))
+    return benchmarks
+
+
+def measure(function, repeat=5, min_time=0.05):
+    # Loops per repeat are picked so a repeat takes at least min_time seconds
+    loops = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(loops):
+            function()
+        taken = time.perf_counter() - start
+        if taken >= min_time or loops >= 1 << 20:
+            break
+        loops *= 2 if taken == 0 else max(2, min(10, int(min_time / taken) + 1))
+    timings = [taken / loops]
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(loops):
+            function()
+        timings.append((time.perf_counter() - start) / loops)
+    return {"loops": loops,
+            "min_ns": int(min(timings) * 1e9),
+            "median_ns": int(statistics.median(timings) * 1e9)}
+
+
+def run(selected=None, repeat=5, min_time=0.05):
+    results = {}
+    for name, function in cases():
+        if selected and not any(part in name for part in selected):
+            continue
+        results[name] = measure(function, repeat, min_time)
+    return {"meta": {"python": platform.python_version(),
+                     "platform": platform.platform(),
+                     "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                     "repeat": repeat},
+            "results": results}
+
+
+def compare(current, baseline, tolerance):
+    """
+    Median time of each case against the baseline, as (name, baseline ns,
+    current ns, ratio, status).  A case is a regression when it is slower by
+    more than tolerance, e.g. 0.25 for 25%.
+    """
+    rows = []
+    for name, result in current["results"].items():
+        previous = baseline["results"].get(name)
+        if previous is None:
+            rows.append((name, None, result["median_ns"], None, "new"))
+            continue
+        ratio = result["median_ns"] / max(previous["median_ns"], 1)
+        if ratio > 1 + tolerance:
+            status = "regression"
+        elif ratio < 1 / (1 + tolerance):
+            status = "faster"
+        else:
+            status = "ok"
+        rows.append((name, previous["median_ns"], result["median_ns"], ratio, status))
+    return rows
+
+
+def report(current, rows=None):
+    if rows is None:
+        for name, result in current["results"].items():
+            print(f"{name:20} {result['median_ns']:>15} ns  (min {result['min_ns']} ns, {result['loops']} loops)")
+        return
+    for name, previous, median, ratio, status in rows:
+        if previous is None:
+            print(f"{name:20} {median:>15} ns  {status}")
+        else:
+            print(f"{name:20} {median:>15} ns  {ratio:6.2f}x of {previous} ns  {status}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the hyperoperations and Expression.simplify.")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    parser.add_argument("--baseline", help="compare against the results in this JSON file")
+    parser.add_argument("--save-baseline", help="write the results to this file as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="allowed slowdown against the baseline, as a fraction (default 0.25)")
+    parser.add_argument("--repeat", type=int, default=5, help="timed repeats per case (default 5)")
+    parser.add_argument("--min-time", type=float, default=0.05,
+                        help="minimum seconds per repeat (default 0.05)")
+    parser.add_argument("--filter", nargs="*", help="only run cases whose name contains one of these")
+    parser.add_argument("--list", action="store_true", help="list the case names and exit")
+    args = parser.parse_args(argv)
+
+    if args.list:
+        for name, _ in cases():
+            print(name)
+        return 0
+    current = run(args.filter, args.repeat, args.min_time)
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, "w") as file:
+                json.dump(current, file, indent=2)
+    if not args.baseline:
+        report(current)
+        return 0
+    with open(args.baseline) as file:
+        baseline = json.load(file)
+    rows = compare(current, baseline, args.tolerance)
+    report(current, rows)
+    regressions = [row[0] for row in rows if row[4] == "regression"]
+    if regressions:
+        print(f"{len(regressions)} regression(s) past {args.tolerance:.0%}: {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,148 @@
+"""
+Profiles one Number operation or an Expression workload on demand.
+
+The workload runs twice: once under cProfile, whose stats are written for pstats
+or snakeviz, and once under a stack collector, whose collapsed stacks (one
+"outer;inner;leaf microseconds" line per stack) feed flamegraph.pl or speedscope.
+The two can't share a run, as both hook sys.setprofile.
+
+    python Number_profile.py log 1000000 2
+    python Number_profile.py tetr 2 5 --lazy --repeat 3
+    python Number_profile.py --simplify 40 --pstats simplify.prof --collapsed simplify.folded
+"""
+from Number import Number
+from Expression import Operator
+from Batch import Batch, unary
+from Number_bench import sum_chain
+from collections import Counter
+import argparse
+import cProfile
+import pstats
+import sys
+import time
+
+
+class StackCollector:
+    """
+    Self time per call stack, gathered through sys.setprofile.  C functions are
+    included, so time spent in builtins shows under their caller.
+    """
+    __slots__ = ('stacks', '_keys', '_last')
+
+    def __init__(self):
+        self.stacks = Counter()
+        self._keys = []
+        self._last = 0
+
+    @staticmethod
+    def _label(frame, event, arg):
+        if event.startswith("c_"):
+            return f"{getattr(arg, '__module__', None) or 'builtins'}.{arg.__qualname__}"
+        code = frame.f_code
+        return f"{frame.f_globals.get('__name__', '?')}.{getattr(code, 'co_qualname', code.co_name)}"
+
+    def _event(self, frame, event, arg):
+        now = time.perf_counter_ns()
+        if self._keys:
+            self.stacks[self._keys[-1]] += now - self._last
+        if event in ("call", "c_call"):
+            label = self._label(frame, event, arg)
+            self._keys.append(f"{self._keys[-1]};{label}" if self._keys else label)
+        elif self._keys:
+            self._keys.pop()
+        self._last = time.perf_counter_ns()
+
+    def runcall(self, function):
+        # Like cProfile.Profile.runcall, collecting stacks only while function runs
+        sys.setprofile(self._event)
+        try:
+            return function()
+        finally:
+            sys.setprofile(None)
+            self._keys = []
+
+    def write(self, path):
+        with open(path, "w") as file:
+            for stack, elapsed in sorted(self.stacks.items()):
+                if elapsed >= 1000:
+                    file.write(f"{stack} {elapsed // 1000}\n")
+
+
+def operation(name, operands, lazy=False):
+    if name not in Batch.operators:
+        raise Exception(f"{name} is not a Number operator")
+    if len(operands) != (1 if name in unary else 2):
+        raise Exception(f"{name} takes {'one operand' if name in unary else 'two operands'}")
+    a = Number.from_int(operands[0])
+    if name in unary:
+        return getattr(a, name)
+    b = Number.from_int(operands[1])
+    if lazy:
+        if name != "tetr":
+            raise Exception("Only tetr can be lazy")
+        return lambda: a.tetr(b, lazy=True)
+    return lambda: getattr(a, name)(b)
+
+
+def simplification(terms):
+    expression = sum_chain(terms)
+
+    def run():
+        Operator.cache.clear()
+        return expression.simplify()
+    return run
+
+
+def profile(workload, repeat=1, pstats_path=None, collapsed_path=None):
+    def run():
+        for _ in range(repeat):
+            workload()
+
+    profiler = cProfile.Profile()
+    profiler.runcall(run)
+    stats = pstats.Stats(profiler)
+    if pstats_path:
+        stats.dump_stats(pstats_path)
+    collector = StackCollector()
+    collector.runcall(run)
+    if collapsed_path:
+        collector.write(collapsed_path)
+    return stats, collector
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Profile a Number operation or Expression.simplify.")
+    parser.add_argument("operator", nargs="?", help="Number operator to run, e.g. log or tetr")
+    parser.add_argument("operands", nargs="*", type=int, help="operands as integers, one for inc and dec")
+    parser.add_argument("--simplify", type=int, metavar="TERMS",
+                        help="profile simplifying an X + 1 + ... + TERMS chain instead")
+    parser.add_argument("--lazy", action="store_true", help="build tetr results as a lazy Tower")
+    parser.add_argument("--repeat", type=int, default=1, help="runs of the workload (default 1)")
+    parser.add_argument("--pstats", help="pstats output file (default <workload>.prof)")
+    parser.add_argument("--collapsed", help="collapsed stack output file (default <workload>.folded)")
+    parser.add_argument("--top", type=int, default=20, help="functions to print by cumulative time")
+    args = parser.parse_args(argv)
+
+    if args.simplify is not None:
+        if args.operator:
+            parser.error("give either an operator or --simplify, not both")
+        workload, label = simplification(args.simplify), f"simplify-{args.simplify}"
+    elif args.operator:
+        try:
+            workload = operation(args.operator, args.operands, args.lazy)
+        except Exception as error:
+            parser.error(str(error))
+        label = "-".join([args.operator] + [str(operand) for operand in args.operands])
+    else:
+        parser.error("give an operator and its operands, or --simplify")
+    pstats_path = args.pstats or f"{label}.prof"
+    collapsed_path = args.collapsed or f"{label}.folded"
+
+    stats, _ = profile(workload, args.repeat, pstats_path, collapsed_path)
+    stats.sort_stats("cumulative").print_stats(args.top)
+    print(f"Wrote {pstats_path} and {collapsed_path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
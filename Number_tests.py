@@ -1,9 +1,13 @@
 from Number import Number, UndefinedError, ComplexUnimplemented
 from Number import PreDefs
 from typing import Final
-import time
+import pickle
+import tracemalloc
 from pprint import pprint
 from Number import Sign
+from Number import Magnitude, NumberState, Tower
+from Number import SmallNumbers, small_numbers
+from Number import Budget, MappedMagnitude, PackedMagnitude
 
 # short name to reduce clutter
 n_ = PreDefs()
@@ -40,6 +44,94 @@ def standard_tests():
     pos_one = negative_zero.inc()
     assert_val_equal(pos_one.compare(n_.one))
 
+# Magnitude
+    # A list magnitude is still accepted and is stored as a count
+    three_from_list = Number(NumberState(['x', 'x', 'x'], Sign.pos))
+    assert_val_equal(three_from_list.compare(n_.three))
+    assert_equal(three_from_list.state.get_magnitude().count, 3)
+    # It still behaves like the unary list it replaced
+    assert_equal(list(Magnitude(2)), ['x', 'x'])
+    assert_equal(Magnitude(3)[0], 'x')
+    assert_equal(Magnitude(3)[1:].count, 2)
+    assert_equal(Magnitude(1)[1:].count, 0)
+    no_digit = False
+    try:
+        Magnitude(0)[0]
+    except IndexError:
+        no_digit = True
+    assert no_digit
+    # Magnitude comparison ignores sign
+    assert_equal(n_.two.state.compare_magnitude(n_.three.state), "less")
+    assert_equal(n_.neg_one.state.compare_magnitude(n_.zero.state), "greater")
+    assert_val_equal(n_.neg_one.state.compare_magnitude(n_.one.state))
+    # File backed magnitudes hold real unary digits and mix with counted ones
+    mapped_five = Number(NumberState(MappedMagnitude(5), Sign.pos))
+    mapped_three = Number(NumberState(MappedMagnitude(3), Sign.pos))
+    assert_equal(list(mapped_three.state.get_magnitude()), ['x', 'x', 'x'])
+    assert_equal(mapped_three.state.get_magnitude()[-1], 'x')
+    mapped_eight = mapped_five.add(mapped_three)
+    assert isinstance(mapped_eight.state.get_magnitude(), MappedMagnitude)
+    assert_val_equal(mapped_eight.compare(n_.eight))
+    assert_val_equal(mapped_five.sub(n_.seven).compare(Number(n_.two, Sign.neg)))
+    assert_equal(mapped_five.mul(mapped_three).repr_standard(), "15")
+    assert_equal(mapped_three.pow(n_.four).repr_standard(), "81")
+    assert isinstance(mapped_three.pow(n_.four).state.get_magnitude(), MappedMagnitude)
+    assert_equal(mapped_eight.div(n_.three)[1].repr_standard(), "2")
+    assert_val_equal(mapped_five.dec().compare(n_.four))
+    # Shorter results share the file, longer ones grow it
+    assert mapped_five.state.get_magnitude()[1:]._file is mapped_five.state.get_magnitude()._file
+    assert_equal(b"".join(mapped_eight.state.get_magnitude().chunks()), b"x" * 8)
+    # Growing appends to the same file, which earlier prefixes keep reading from
+    mapped_nine = mapped_eight.inc()
+    assert mapped_nine.state.get_magnitude()._file is mapped_eight.state.get_magnitude()._file
+    assert_equal(list(mapped_nine.state.get_magnitude()), ['x'] * 9)
+    assert_equal(list(mapped_eight.state.get_magnitude()), ['x'] * 8)
+    # Products start from an empty view of the operand's file, so they share it too
+    mapped_thousand = Number(NumberState(MappedMagnitude(1000), Sign.pos))
+    product = mapped_thousand.mul(Number.from_int(1000))
+    assert product.state.get_magnitude()._file is mapped_thousand.state.get_magnitude()._file
+    assert mapped_five.mul(n_.zero).state.get_magnitude()._file is mapped_five.state.get_magnitude()._file
+    # Packed magnitudes keep one bit per digit
+    packed_nine = Number(NumberState(PackedMagnitude(9), Sign.pos))
+    assert_equal(packed_nine.state.get_magnitude().nbytes, 2)
+    assert_equal(list(packed_nine.state.get_magnitude()[7:]), ['x', 'x'])
+    assert_equal(packed_nine.state.get_magnitude()[8], 'x')
+    assert_val_equal(packed_nine.dec().compare(n_.eight))
+    assert packed_nine.dec().state.get_magnitude().buffer is packed_nine.state.get_magnitude().buffer
+    packed_eighty_one = packed_nine.mul(packed_nine)
+    assert isinstance(packed_eighty_one.state.get_magnitude(), PackedMagnitude)
+    assert_equal(packed_eighty_one.repr_standard(), "81")
+    assert_equal(packed_eighty_one.state.get_magnitude().nbytes, 11)
+    assert_val_equal(packed_eighty_one.div(packed_nine)[0].compare(n_.nine))
+    assert_val_equal(packed_nine.sub(packed_nine.inc()).compare(n_.neg_one))
+    # Numbers pickle as count and sign, and Towers stay lazy
+    negative_zero = Number(NumberState(Magnitude(0), Sign.neg))
+    assert_equal(pickle.loads(pickle.dumps(negative_zero)).state.get_sign(), Sign.neg)
+    assert_val_equal(pickle.loads(pickle.dumps(packed_eighty_one)).compare(packed_eighty_one))
+    unpickled_tower = pickle.loads(pickle.dumps(n_.two.tetr(Number.from_int(6), lazy=True)))
+    assert_equal(unpickled_tower.repr_standard(), "2 ^^ 6")
+
+    # Numbers hash and compare equal by value, with -0 distinct from 0
+    assert n_.three == n_.one.add(n_.two)
+    assert n_.three != n_.two
+    assert hash(n_.three) == hash(n_.one.add(n_.two))
+    assert len({n_.zero, Number(n_.zero, Sign.neg), n_.one.sub(n_.one)}) == 2
+    # Small numbers are interned and shared rather than copied
+    assert Number.from_int(3) is n_.three
+    assert PreDefs().ten is n_.ten
+    assert n_.neg_one is Number.from_int(-1)
+    assert_val_equal(Number.from_int(-7).compare(Number(n_.seven, Sign.neg)))
+    outside = small_numbers.high + 1
+    assert Number.from_int(outside) is not Number.from_int(outside)
+    assert_val_equal(Number.from_int(outside).compare(Number.from_int(outside)))
+    narrow = SmallNumbers(0, 2)
+    assert narrow.get(2) is narrow.get(2)
+    assert not narrow.covers(3)
+    # Magnitudes are read without copying and shared by clones
+    assert n_.three.state.get_magnitude() is n_.three.state.get_magnitude()
+    assert n_.three.clone().state.get_magnitude() is n_.three.state.get_magnitude()
+    assert_equal(n_.neg_one.clone().state.get_sign(), Sign.neg)
+
 
 # Addition
     print("Running Addition Tests")
@@ -70,6 +162,13 @@ def standard_tests():
     assert_val_equal(n_.neg_one.add(n_.neg_one).compare(Number(n_.two, Sign.neg)))
     # -1 + 4 = 3
     assert_val_equal(n_.neg_one.add(n_.four).compare(Number(n_.three, Sign.pos)))
+    # -4 + 4 = -0, as with four successive inc() calls
+    assert_val_equal(Number(n_.four, Sign.neg).add(n_.four).compare(Number(n_.zero, Sign.neg)))
+    # 2 + -5 = -3
+    assert_val_equal(n_.two.add(Number(n_.five, Sign.neg)).compare(Number(n_.three, Sign.neg)))
+    # -5 + 0 = -5 and -5 - 0 = -5, a zero addend keeps the sign
+    assert_val_equal(Number(n_.five, Sign.neg).add(n_.zero).compare(Number(n_.five, Sign.neg)))
+    assert_val_equal(Number(n_.five, Sign.neg).sub(n_.zero).compare(Number(n_.five, Sign.neg)))
 
 
 
@@ -117,6 +216,12 @@ def standard_tests():
     neg_five = n_.five.mul(n_.neg_one)
     assert_val_equal(neg_two.mul(neg_five).compare(Number(n_.ten)))
 
+    # Odd and even multipliers both double and add correctly... 7 * 9 = 9 * 7
+    sixtythree = n_.seven.mul(n_.nine)
+    assert_val_equal(sixtythree.compare(n_.nine.mul(n_.seven)))
+    assert_equal(sixtythree.repr_standard(), "63")
+    assert_equal(n_.eight.mul(n_.eight).repr_standard(), "64")
+
 
 # Power
     print("Running Power Tests")
@@ -148,6 +253,11 @@ def standard_tests():
     assert_val_equal(n_.neg_one.pow(n_.two).compare(n_.one))
     # -2^3 = -8
     assert_val_equal(Number(n_.two, Sign.neg).pow(n_.three).compare(Number(n_.eight, Sign.neg)))
+    # Odd and even exponents... 3^5 = 243, 2^10 = 1024, -2^5 = -32, -0^3 = -0
+    assert_equal(n_.three.pow(n_.five).repr_standard(), "243")
+    assert_equal(n_.two.pow(n_.ten).repr_standard(), "1024")
+    assert_val_equal(Number(n_.two, Sign.neg).pow(n_.five).compare(Number(n_.eight.mul(n_.four), Sign.neg)))
+    assert_val_equal(Number(n_.zero, Sign.neg).pow(n_.three).compare(Number(n_.zero, Sign.neg)))
     # 2^-3 = 1/8
     two_to_neg_three = n_.two.pow(Number(n_.three, Sign.neg))
     one_eighth = n_.one.div(n_.eight)
@@ -171,6 +281,72 @@ def standard_tests():
     two_tetra_neg_three = n_.two.tetr(n_.three.mul(n_.neg_one))
     assert_val_equal(sixteen.compare(two_tetra_three))
 
+    # Towers are right associative... 2 ^^ 4 = 2^(2^(2^2)) = 65536
+    assert_equal(n_.two.tetr(n_.four).repr_standard(), "65536")
+    # 3 ^^ 3 = 3^27
+    assert_equal(n_.three.tetr(n_.three).repr_standard(), "7625597484987")
+
+    # Tetration and above come from the generic hyperoperation engine
+    assert_val_equal(n_.two.hyper(4, n_.three).compare(sixteen))
+    # Lower ranks go to their own kernels... H_0(2, 5) = 6, H_2(3, 5) = 15
+    assert_val_equal(n_.two.hyper(0, n_.five).compare(n_.six))
+    assert_equal(n_.three.hyper(2, n_.five).repr_standard(), "15")
+    # Pentation... 2 ^^^ 3 = 2 ^^ 4 = 65536, 3 ^^^ 2 = 3 ^^ 3
+    assert_equal(n_.two.pent(n_.three).repr_standard(), "65536")
+    assert_val_equal(n_.three.pent(n_.two).compare(n_.three.tetr(n_.three)))
+    # Hexation... 2 ^^^^ 2 = 2 ^^^ 2 = 2 ^^ 2 = 4, H_n(a, 0) = 1, H_n(a, 1) = a
+    assert_val_equal(n_.two.hexa(n_.two).compare(n_.four))
+    assert_val_equal(n_.five.hyper(7, n_.zero).compare(n_.one))
+    assert_val_equal(n_.five.hyper(7, n_.one).compare(n_.five))
+
+    # Streaming tower levels... 1, 2, 4, 16, 65536
+    levels = [level.repr_standard() for _, level, _, _ in n_.two.tetr_levels(n_.four)]
+    assert_equal(levels, ["1", "2", "4", "16", "65536"])
+    # Budgets stop the stream cleanly between levels
+    budget = Budget(steps=2)
+    assert_equal(len(list(n_.two.tetr_levels(budget=budget))), 3)
+    assert_equal(budget.reason, "steps")
+    budget = Budget(memory=1024)
+    heights = [height.repr_standard() for height, _, _, _ in n_.two.tetr_levels(budget=budget)]
+    # 2 ^^ 5 has a 65537 bit digit count, well past 1024 bytes
+    assert_equal(heights, ["0", "1", "2", "3", "4"])
+    assert_equal(budget.reason, "memory")
+    budget = Budget()
+    for height, _, _, _ in n_.two.tetr_levels(budget=budget):
+        if height.compare(n_.two) == "equal":
+            budget.cancel()
+    assert_equal(budget.reason, "cancelled")
+
+    # Lazy towers
+    two_tetra_six = n_.two.tetr(n_.six, lazy=True)
+    assert isinstance(two_tetra_six, Tower)
+    assert_equal(two_tetra_six.repr_standard(), "2 ^^ 6")
+    # Compare, log and superlog work on the tower without building its digits
+    assert_equal(two_tetra_six.compare(n_.two.tetr(n_.five, lazy=True)), "greater")
+    two_tetra_five, log_remainder = two_tetra_six.log(n_.two)
+    assert_equal(two_tetra_five.repr_standard(), "2 ^^ 5")
+    assert_val_equal(log_remainder.compare(n_.zero))
+    assert_val_equal(two_tetra_six.superlog(n_.two)[0].compare(n_.six))
+    assert_val_equal(two_tetra_six.superlog(n_.two)[1].compare(n_.zero))
+    # Against plain Numbers and towers of other bases, from the levels and heights
+    assert_equal(two_tetra_six.compare(n_.one), "greater")
+    assert_equal(n_.one.compare(two_tetra_six), "less")
+    assert_equal(two_tetra_six.compare(n_.neg_one), "greater")
+    assert_equal(two_tetra_six.compare(n_.three.tetr(n_.six, lazy=True)), "less")
+    assert_equal(two_tetra_six.compare(n_.three.tetr(n_.four, lazy=True)), "greater")
+    assert_equal(n_.three.tetr(n_.two, lazy=True).compare(n_.two.tetr(n_.three, lazy=True)), "greater")
+    assert_equal(n_.two.tetr(n_.four, lazy=True).compare(n_.three.tetr(n_.three, lazy=True)), "less")
+    assert_val_equal(n_.two.tetr(n_.four, lazy=True).compare(n_.two.pow(sixteen)))
+    # Towers hash by base and height, so they can key sets and caches
+    assert_equal(len({two_tetra_six, n_.two.tetr(n_.six, lazy=True)}), 1)
+    assert two_tetra_six != n_.two.tetr(n_.five, lazy=True)
+    assert n_.two.tetr(n_.four, lazy=True) != n_.two.pow(sixteen)
+    assert two_tetra_six._materialized is None
+    # Digits are built on request and then behave as a normal Number
+    assert_val_equal(n_.two.tetr(n_.three, lazy=True).compare(sixteen))
+    assert_val_equal(n_.two.tetr(n_.three, lazy=True).add(n_.one).compare(sixteen.inc()))
+    assert_equal(n_.two.tetr(n_.three, lazy=True).materialize().repr_standard(), "16")
+
 
 
 # decrement
@@ -206,6 +382,12 @@ def standard_tests():
     # 10-20=-10
     neg_ten = n_.ten.sub(n_.ten.mul(n_.two))
     assert_val_equal(neg_ten.compare(Number(n_.ten, Sign.neg)))
+    # 0-(-2)=2
+    assert_val_equal(n_.zero.sub(Number(n_.two, Sign.neg)).compare(n_.two))
+    # -2-(-3)=1
+    assert_val_equal(Number(n_.two, Sign.neg).sub(Number(n_.three, Sign.neg)).compare(n_.one))
+    # -3-(-3)=-0
+    assert_val_equal(Number(n_.three, Sign.neg).sub(Number(n_.three, Sign.neg)).compare(neg_zero))
 
 
     # inverse operation tests
@@ -255,6 +437,13 @@ def standard_tests():
     assert_val_equal(n_.one.div(n_.eight)[1].compare(n_.one))
 
 
+    # Larger quotients... 100/7 = 14,2 and 1024/2 = 512,0
+    hundred = n_.ten.mul(n_.ten)
+    assert_equal(hundred.div(n_.seven)[0].repr_standard(), "14")
+    assert_equal(hundred.div(n_.seven)[1].repr_standard(), "2")
+    assert_equal(n_.two.pow(n_.ten).div(n_.two)[0].repr_standard(), "512")
+    assert_val_equal(n_.two.pow(n_.ten).div(n_.two)[1].compare(n_.zero))
+
     # 1/0 = by definition, returns DivideByZeroError
     no_except = True
     try:
@@ -279,6 +468,14 @@ def standard_tests():
         no_except = False
     assert (not no_except)
 
+    # 1/-0 = divide_by_zero
+    no_except = True
+    try:
+        n_.one.div(neg_zero)
+    except ZeroDivisionError:
+        no_except = False
+    assert (not no_except)
+
     # -0/-1 = 0, 0
     assert_val_equal(neg_zero.div(n_.neg_one)[0].compare(n_.zero))
     assert_val_equal(neg_zero.div(n_.neg_one)[0].compare(n_.zero))
@@ -433,6 +630,19 @@ def standard_tests():
 
 
 
+    # logˇ2(1023) = 9, mant=511
+    ten_twenty_three = n_.two.pow(n_.ten).dec()
+    assert_equal(ten_twenty_three.log(n_.two)[0].repr_standard(), "9")
+    assert_equal(ten_twenty_three.log(n_.two)[1].repr_standard(), "511")
+
+    # logˇ-1(2) = undefined, (-1)^x is only ever 1 or -1
+    saw_exception = False
+    try:
+        n_.two.log(n_.neg_one)
+    except UndefinedError as e:
+        saw_exception = True
+    assert(saw_exception)
+
     # inverse operation test
     # general - logˇX(pow(X,Y) = Y, mant=0
     # logˇ5(pow(5,3) = 3, mant=0
@@ -494,28 +704,56 @@ def standard_tests():
     assert_val_equal(twofiftyfive.superlog(n_.two)[0].compare(n_.three))
     assert_val_equal(twofiftyfive.superlog(n_.two)[1].compare(twothirtynine))
 
+    # superlogˇ2(65536) = 4, 0 (2^2^2^2 = 2^16)
+    sixtyfivethirtysix: Final = n_.two.pow(sixteen)
+    assert_val_equal(sixtyfivethirtysix.superlog(n_.two)[0].compare(n_.four))
+    assert_val_equal(sixtyfivethirtysix.superlog(n_.two)[1].compare(n_.zero))
+
+    # superlogˇ2(1) = 0, 0 (2^^0 = 1)
+    assert_val_equal(n_.one.superlog(n_.two)[0].compare(n_.zero))
+    assert_val_equal(n_.one.superlog(n_.two)[1].compare(n_.zero))
+
+    # superlogˇ3(26) = 1, 23 (3^^1 = 3, 3^^2 = 27)
+    assert_equal(n_.three.pow(n_.three).dec().superlog(n_.three)[0].repr_standard(), "1")
+    assert_equal(n_.three.pow(n_.three).dec().superlog(n_.three)[1].repr_standard(), "23")
+
+
+
+def memory_footprint(count=None):
+    # Per-object memory of the slotted layout against the same classes with a
+    # per-instance __dict__, over as many objects as 2^^4 takes unary steps.
+    if count is None:
+        count = n_.two.tetr(n_.four).state.get_magnitude().count
+
+    # Subclasses that don't declare __slots__ get a __dict__ back
+    class DictMagnitude(Magnitude):
+        pass
+
+    class DictNumberState(NumberState):
+        pass
+
+    class DictNumber(Number):
+        pass
 
+    def measure(make):
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        objects = [make(i) for i in range(count)]
+        used = tracemalloc.get_traced_memory()[0] - before
+        tracemalloc.stop()
+        del objects
+        return used // count
 
-def time_tetration():
-    results = {}
-    count = 0
-    height = n_.zero
-    while True:
-        start = time.time_ns()
-        result = n_.two.tetr(height)
-        duration = time.time_ns() - start
-        results[count] = (duration, len(result.state))
-        if count > 4:
-            # Stop at 64K.  64K outside of debug mode is ~12s on my laptop.
-            # Next would be 4GB.  Assuming runtime is linear vs size as this is just
-            # adding more unary digits, that is ~5K un-digits/s.  4GB is ~850K seconds/
-            # ~14K minutes/~238 hours/~4 days.  Small differences in implementations can push
-            # this time down to barely measurable or unreasonably long for a unit test.
-            break
-        count += 1
-        height = height.inc()
-    print(f"Tetration stats:")
-    pprint.pprint(results)
+    state = NumberState(Magnitude(1), Sign.pos)
+    results = {
+        "Magnitude": (measure(lambda i: Magnitude(i)), measure(lambda i: DictMagnitude(i))),
+        "NumberState": (measure(lambda i: NumberState(state.get_magnitude(), Sign.pos)),
+                        measure(lambda i: DictNumberState(state.get_magnitude(), Sign.pos))),
+        "Number": (measure(lambda i: Number(state)), measure(lambda i: DictNumber(state))),
+    }
+    print(f"Memory per object over {count} objects (bytes slotted, bytes with __dict__):")
+    pprint(results)
+    return results
 
 
 def algebraic_rules():
@@ -578,4 +816,4 @@ def algebraic_rules():
 if __name__ == '__main__':
     standard_tests()
     algebraic_rules()
-    # time_tetration()
+    # memory_footprint()
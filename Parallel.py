@@ -0,0 +1,378 @@
+from Number import Number, NumberState, Magnitude, MappedMagnitude, PackedMagnitude
+from Number import UnderflowError, Budget
+from Number import PreDefs
+from Expression import CostEstimator, CostExceeded
+from Number_tests import assert_equal, assert_val_equal
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import resource_tracker, shared_memory
+import math
+import os
+import time
+from pprint import pprint
+
+
+n_ = PreDefs()
+
+
+def _write(buffer, start, stop, value, chunk_size):
+    fill = value * chunk_size
+    position = start
+    while position < stop:
+        piece = min(chunk_size, stop - position)
+        buffer[position:position + piece] = fill[:piece]
+        position += piece
+
+
+def _fill_slice(name, start, stop, value, chunk_size):
+    # Runs in a worker: attach to the buffer and fill bytes [start, stop) only.
+    # Workers only borrow the buffer, which the process that created it unlinks.
+    # Registering it with the resource tracker would unlink it a second time, and
+    # a forked worker can block on the tracker's lock, so the attach skips it.
+    register = resource_tracker.register
+    resource_tracker.register = lambda *args: None
+    try:
+        shared = shared_memory.SharedMemory(name=name)
+    finally:
+        resource_tracker.register = register
+    try:
+        _write(shared.buf, start, stop, value, chunk_size)
+    finally:
+        shared.close()
+    return stop - start
+
+
+class _SharedDigits:
+    """
+    A shared memory buffer of unary digits, either one bit or one byte per digit.
+    It is filled once and never changes, so SharedMagnitudes share it as prefixes.
+    kernel is the Parallel that filled it, which also fills the buffers of longer
+    results.  The process that created it unlinks it when the last view goes away.
+    """
+    __slots__ = ('size', 'packed', 'kernel', '_shared')
+
+    def __init__(self, size, packed, kernel=None):
+        self.size = size
+        self.packed = packed
+        self.kernel = kernel
+        self._shared = shared_memory.SharedMemory(create=True, size=max(self.nbytes_for(size, packed), 1))
+
+    @staticmethod
+    def nbytes_for(count, packed):
+        return (count + 7) // 8 if packed else count
+
+    @property
+    def name(self):
+        return self._shared.name
+
+    @property
+    def buffer(self):
+        return self._shared.buf
+
+    def digit_at(self, index):
+        if self.packed:
+            return (self._shared.buf[index >> 3] >> (index & 7)) & 1
+        return self._shared.buf[index] == SharedMagnitude.digit_byte[0]
+
+    def __del__(self):
+        self._shared.close()
+        self._shared.unlink()
+
+
+class SharedMagnitude(Magnitude):
+    """
+    A unary magnitude whose digits live in a multiprocessing.shared_memory buffer,
+    packed one bit per digit or one byte per digit.
+
+    Parallel builds these with its workers each filling a disjoint slice of the
+    buffer, so large results never get pickled between processes.  Prefixes are
+    views of the same buffer.  Growing past it fills a new buffer of at least twice
+    the size through the Parallel that filled this one, so Number.mul and pow on a SharedMagnitude
+    build their larger intermediates over the pool too.
+    """
+    __slots__ = ('_digits',)
+
+    digit_byte = b'x'
+    packed = True
+
+    def __init__(self, count=0):
+        super().__init__(count)
+        self._digits = _SharedDigits(count, self.packed)
+        Parallel.fill_serial(self._digits)
+
+    @classmethod
+    def _view(cls, digits, count):
+        magnitude = object.__new__(cls)
+        magnitude._count = count
+        magnitude._digits = digits
+        return magnitude
+
+    @property
+    def buffer(self):
+        return self._digits.buffer
+
+    def _resized(self, count):
+        if count < 0:
+            raise UnderflowError("A magnitude cannot have fewer than zero digits")
+        if count <= self._digits.size:
+            return self._view(self._digits, count)
+        # Grow to at least twice the buffer, so a run of small steps like inc()
+        # refills it O(log n) times rather than once per step
+        capacity = max(count, 2 * self._digits.size)
+        kernel = self._digits.kernel
+        if kernel is None or kernel.closed:
+            digits = _SharedDigits(capacity, self._digits.packed)
+            Parallel.fill_serial(digits)
+            return self._view(digits, count)
+        return kernel.fill(count, capacity)
+
+    def __iter__(self):
+        for index in range(self._count):
+            if self._digits.digit_at(index):
+                yield self.digit
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return super().__getitem__(index)
+        if not -self._count <= index < self._count:
+            raise IndexError("Magnitude index out of range")
+        if not self._digits.digit_at(index % self._count):
+            raise UnderflowError("A shared magnitude lost one of its digits")
+        return self.digit
+
+    # Sized for this magnitude's own buffer, which may be packed or not
+    def nbytes_for(self, count):
+        return _SharedDigits.nbytes_for(count, self._digits.packed)
+
+    def pow_nbytes(self, base, exponent):
+        if self._digits.packed:
+            return PackedMagnitude.pow_nbytes(base, exponent)
+        return MappedMagnitude.pow_nbytes(base, exponent)
+
+    def __reduce__(self):
+        # The buffer stays with this process, others get their own copy of the digits
+        if self._digits.packed:
+            return PackedMagnitude, (self._count,)
+        return MappedMagnitude, (self._count,)
+
+
+class Parallel:
+    """
+    Builds the digits of large mul, pow and tetr results over a process pool.
+
+    None of the arithmetic can be parallelized.  Magnitudes are digit counts, so
+    the count and sign of a result come from the Number algorithms on count-only
+    magnitudes, serially, in O(log) bulk steps that never touch a digit.  The only
+    work left for the pool is writing the digits: every unary digit is the same
+    byte (or bit), so the buffer is split into disjoint byte-aligned slices, one
+    per task, that the workers memset directly in shared memory.  Results smaller
+    than two slices are filled here.  tasks counts the slices handed to the pool.
+
+    That makes a Parallel result always slower and bigger than the plain counted
+    Number of the same value.  It is only worth it when the digits themselves are
+    needed in memory that other processes can read.  fill_benchmark() measures it.
+
+    Every result is estimated before any work, and refused with CostExceeded when
+    its steps are past the estimator's limit or its buffer past the budget's memory
+    limit, memory_limit bytes unless another Budget is given.
+    """
+
+    chunk_size = 1 << 20
+    memory_limit = 1 << 32
+    estimator = CostEstimator()
+
+    def __init__(self, processes=None, packed=True, slice_size=1 << 24, budget=None):
+        if slice_size < 8:
+            raise Exception("A Parallel slice must be at least one byte of digits")
+        self.processes = processes
+        self.packed = packed
+        self.slice_size = slice_size
+        self.budget = Budget(memory=self.memory_limit) if budget is None else budget
+        self.tasks = 0
+        self.closed = False
+        self._executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.closed = True
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    @staticmethod
+    def _fill_value(digits):
+        return b'\xff' if digits.packed else SharedMagnitude.digit_byte
+
+    @classmethod
+    def fill_serial(cls, digits):
+        _write(digits.buffer, 0, digits.nbytes_for(digits.size, digits.packed),
+               cls._fill_value(digits), cls.chunk_size)
+
+    def fill(self, count, capacity=None):
+        # A shared magnitude of count digits, filled slice by slice.  capacity digits
+        # are allocated and filled, leaving room for the magnitude to grow into.
+        size = count if capacity is None else max(count, capacity)
+        if size > count and not self.budget.allows(_SharedDigits.nbytes_for(size, self.packed)):
+            # No room to spare, so allocate only what is needed
+            size = count
+        self._check_nbytes("fill", _SharedDigits.nbytes_for(size, self.packed))
+        digits = _SharedDigits(size, self.packed, self)
+        nbytes = digits.nbytes_for(size, self.packed)
+        slice_bytes = digits.nbytes_for(self.slice_size, self.packed)
+        if nbytes < 2 * slice_bytes:
+            self.fill_serial(digits)
+        else:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.processes)
+            starts = range(0, nbytes, slice_bytes)
+            futures = [self._executor.submit(_fill_slice, digits.name, start,
+                                             min(start + slice_bytes, nbytes),
+                                             self._fill_value(digits), self.chunk_size)
+                       for start in starts]
+            self.tasks += len(futures)
+            for future in futures:
+                future.result()
+        return SharedMagnitude._view(digits, count)
+
+    def _check_nbytes(self, name, nbytes, steps=0):
+        if steps > self.estimator.max_steps or not self.budget.allows(nbytes):
+            raise CostExceeded(f"{name} is predicted to take {nbytes} bytes and {steps} steps, past the limits "
+                               f"of {self.budget.memory} bytes and {self.estimator.max_steps} steps")
+
+    def _check(self, name, a, b):
+        # Refuse a result before computing its count or allocating its buffer
+        estimate = self.estimator.estimate(name, self._counted(a), self._counted(b))
+        if estimate.digits_log2 >= 1000:
+            nbytes = math.inf
+        else:
+            # Rounded down a little, so 2 ^ log2(n) still comes back as n
+            digits = math.ceil(2 ** max(estimate.digits_log2, 0.0) * (1 - 1e-12))
+            nbytes = _SharedDigits.nbytes_for(digits, self.packed)
+        self._check_nbytes(name, nbytes, estimate.steps)
+
+    def _materialize(self, number):
+        return Number(NumberState(self.fill(number.state.get_magnitude().count),
+                                  number.state.get_sign()))
+
+    @staticmethod
+    def _counted(number):
+        # The same value on a count-only magnitude, so the algorithm touches no digits
+        return Number(NumberState(Magnitude(number.state.get_magnitude().count),
+                                  number.state.get_sign()))
+
+    def mul(self, a, b):
+        if not isinstance(a, Number) or not isinstance(b, Number):
+            raise Exception("You can only mul by Numbers!")
+        self._check("mul", a, b)
+        return self._materialize(self._counted(a).mul(self._counted(b)))
+
+    def pow(self, a, b):
+        if not isinstance(a, Number) or not isinstance(b, Number):
+            raise Exception("You can only pow by Numbers!")
+        self._check("pow", a, b)
+        result = self._counted(a).pow(self._counted(b))
+        if isinstance(result, tuple):
+            # Negative exponents give (quotient, remainder), both at most one digit
+            return result
+        return self._materialize(result)
+
+    def tetr(self, a, b):
+        # Lower levels stay count-only, only the top level gets its digits built
+        if not isinstance(a, Number) or not isinstance(b, Number):
+            raise Exception("You can only tetr by Numbers!")
+        self._check("tetr", a, b)
+        return self._materialize(self._counted(a).tetr(self._counted(b)))
+
+
+def fill_benchmark(exponents=(24, 26, 28), processes=None, packed=False):
+    # Seconds to build 2^k as a plain counted Number, and as a Parallel result filled
+    # here or over the pool.  Only the fill can use more cores, so the pool can at
+    # best close the gap to the serial fill, never to the counted Number.
+    processes = processes or os.cpu_count()
+    results = {}
+    for exponent in exponents:
+        power = Number.from_int(exponent)
+        start = time.perf_counter()
+        n_.two.pow(power)
+        counted = time.perf_counter() - start
+        timings = []
+        for slice_size in (1 << 62, (1 << exponent) // (4 * processes)):
+            with Parallel(processes=processes, packed=packed, slice_size=max(slice_size, 8)) as parallel:
+                # Start the pool before the clock, it is paid for once
+                parallel.fill(1)
+                start = time.perf_counter()
+                parallel.pow(n_.two, power)
+                timings.append(time.perf_counter() - start)
+        results[f"2^{exponent}"] = (counted, *timings)
+    print(f"Seconds for 2^k: counted, serial fill, fill over {processes} processes:")
+    pprint(results)
+    return results
+
+
+def parallel_unit_test():
+    three = Number.from_int(3)
+    # Tiny slices so even small results are split across the workers
+    for packed in (True, False):
+        with Parallel(processes=2, packed=packed, slice_size=64) as parallel:
+            product = parallel.mul(Number.from_int(-37), Number.from_int(29))
+            assert_equal(product.repr_standard(), "1073")
+            assert_equal(len(list(product.state.get_magnitude())), 1073)
+            assert_val_equal(product.compare(Number.from_int(-37).mul(Number.from_int(29))))
+            power = parallel.pow(three, Number.from_int(7))
+            assert_equal(power.repr_standard(), "2187")
+            assert_equal(power.state.get_magnitude()[2186], 'x')
+            assert_equal(power.state.get_magnitude().nbytes, 274 if packed else 2187)
+            tower = parallel.tetr(n_.two, n_.four)
+            assert_equal(tower.repr_standard(), "65536")
+            assert_equal(sum(1 for _ in tower.state.get_magnitude()), 65536)
+            assert_val_equal(tower.dec().compare(Number.from_int(65535)))
+            assert_val_equal(tower.state.get_magnitude().halve()[0].compare(n_.two.pow(Number.from_int(15)).state.get_magnitude()))
+            # Sizes follow the buffer's own layout
+            digits = power.state.get_magnitude()
+            assert_equal(digits.nbytes_for(800), 100 if packed else 800)
+            assert_equal(digits.pow_nbytes(Magnitude(10), Magnitude(3)), 125 if packed else 1000)
+            # Longer results of plain Number operations are filled over the pool too
+            tasks = parallel.tasks
+            quadrupled = power.mul(n_.four)
+            assert isinstance(quadrupled.state.get_magnitude(), SharedMagnitude)
+            assert_equal(quadrupled.repr_standard(), str(2187 * 4))
+            assert_equal(len(list(quadrupled.state.get_magnitude())), 2187 * 4)
+            assert parallel.tasks > tasks
+            # Growing one digit at a time reuses the spare room of the last buffer
+            grown = quadrupled.state.get_magnitude()
+            buffers = {id(grown._digits)}
+            for _ in range(200):
+                grown = grown.succ()
+                buffers.add(id(grown._digits))
+            assert_equal(grown.count, 2187 * 4 + 200)
+            assert_equal(len(buffers), 2)
+    assert_equal(parallel.pow(n_.two, n_.neg_one)[0].repr_standard(), "0")
+
+    # Results past the budget are refused before their count is even computed
+    with Parallel(processes=1) as parallel:
+        for operation, a, b in ((parallel.tetr, n_.two, n_.five),
+                                (parallel.pow, n_.two, Number.from_int(10 ** 6))):
+            refused = False
+            try:
+                operation(a, b)
+            except CostExceeded:
+                refused = True
+            assert refused
+        assert_equal(parallel.tasks, 0)
+    with Parallel(processes=1, budget=Budget(memory=100)) as parallel:
+        assert_equal(parallel.mul(Number.from_int(20), Number.from_int(40)).repr_standard(), "800")
+        refused = False
+        try:
+            parallel.mul(Number.from_int(20), Number.from_int(41))
+        except CostExceeded:
+            refused = True
+        assert refused
+
+
+if __name__ == "__main__":
+    parallel_unit_test()
+    # fill_benchmark()
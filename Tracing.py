@@ -0,0 +1,180 @@
+from Number import Number, NumberState, Magnitude, PackedMagnitude, Sign, Tower
+from Number import PreDefs
+from Number_tests import assert_equal
+from collections import Counter
+import functools
+import time
+
+
+n_ = PreDefs()
+
+
+class Trace:
+    """
+    Counts calls, time and allocations of the Number operations while active.
+
+        with Trace() as trace:
+            n_.two.tetr(n_.four).log(n_.two)
+        print(trace.report())
+
+    Entering swaps the traced methods for counting wrappers and exiting puts the
+    originals back, so outside a Trace the plain methods run with no overhead.
+    Calls are keyed by "Class.method" and time is inclusive, taken at the outermost
+    call of each method so recursion is not counted twice.  allocations counts the
+    Numbers, Towers, NumberStates and Magnitudes built, by class, including the
+    views that magnitude backends build without __init__.  hook, when given, is
+    called as hook(name, elapsed_ns) after every traced call.  Only one Trace can
+    be active.
+    """
+    __slots__ = ('calls', 'time_ns', 'allocations', 'hook', '_depth', '_originals')
+
+    methods = {
+        Number: ("inc", "dec", "clone", "add", "sub", "mul", "pow", "tetr", "pent", "hexa",
+                 "hyper", "div", "log", "superlog", "compare"),
+        Tower: ("clone", "materialize", "compare", "log", "superlog"),
+        NumberState: ("clone", "compare_magnitude", "compare"),
+    }
+    # Subclasses reach these __init__s through super() and are counted by their own class
+    allocated = (Number, Tower, NumberState, Magnitude)
+
+    _active = None
+
+    def __init__(self, hook=None):
+        self.calls = Counter()
+        self.time_ns = Counter()
+        self.allocations = Counter()
+        self.hook = hook
+        self._depth = Counter()
+        self._originals = []
+
+    def _traced(self, name, method):
+        calls, time_ns, depth, hook = self.calls, self.time_ns, self._depth, self.hook
+
+        @functools.wraps(method)
+        def traced(*args, **kwargs):
+            calls[name] += 1
+            depth[name] += 1
+            start = time.perf_counter_ns()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter_ns() - start
+                depth[name] -= 1
+                if depth[name] == 0:
+                    time_ns[name] += elapsed
+                if hook is not None:
+                    hook(name, elapsed)
+        return traced
+
+    def _counted(self, build, of):
+        # of gives the class being built from build's arguments
+        allocations = self.allocations
+
+        @functools.wraps(build)
+        def counted(*args, **kwargs):
+            allocations[of(args[0]).__name__] += 1
+            return build(*args, **kwargs)
+        return counted
+
+    @staticmethod
+    def _backends(cls=Magnitude):
+        for subclass in cls.__subclasses__():
+            yield subclass
+            yield from Trace._backends(subclass)
+
+    def _patch(self, cls, name, wrapper):
+        self._originals.append((cls, name, cls.__dict__[name]))
+        setattr(cls, name, wrapper)
+
+    def __enter__(self):
+        if Trace._active is not None:
+            raise Exception("Only one Trace can be active at a time")
+        Trace._active = self
+        try:
+            for cls, names in self.methods.items():
+                for name in names:
+                    self._patch(cls, name, self._traced(f"{cls.__name__}.{name}", cls.__dict__[name]))
+            for cls in self.allocated:
+                self._patch(cls, "__init__", self._counted(cls.__dict__["__init__"], type))
+            # Backends build their views with object.__new__, so count _view as well
+            for cls in self._backends():
+                if "_view" in cls.__dict__:
+                    view = cls.__dict__["_view"].__func__
+                    self._patch(cls, "_view", classmethod(self._counted(view, lambda cls: cls)))
+        except BaseException:
+            self.__exit__()
+            raise
+        return self
+
+    def __exit__(self, *exc):
+        for cls, name, original in reversed(self._originals):
+            setattr(cls, name, original)
+        self._originals = []
+        Trace._active = None
+
+    def report(self):
+        # One line per traced method, most called first, then the allocations
+        lines = [f"{name:30} {count:>10} calls {self.time_ns[name]:>15} ns"
+                 for name, count in self.calls.most_common()]
+        lines += [f"{name:30} {count:>10} allocated"
+                  for name, count in self.allocations.most_common()]
+        return "\n".join(lines)
+
+
+def tracing_unit_test():
+    originals = {name: Number.__dict__[name] for name in ("inc", "log", "__init__")}
+    seen = []
+    with Trace(hook=lambda name, elapsed: seen.append(name)) as trace:
+        quotient, remainder = Number.from_int(1000).log(n_.two)
+    assert_equal(quotient.repr_standard(), "9")
+    assert_equal(remainder.repr_standard(), "488")
+    assert_equal(trace.calls["Number.log"], 1)
+    assert trace.calls["Number.mul"] > 0
+    assert trace.calls["Number.compare"] > 0
+    assert trace.allocations["Number"] > 0
+    assert trace.allocations["NumberState"] >= trace.allocations["Number"]
+    assert_equal(len(seen), sum(trace.calls.values()))
+    # Outermost call only, so log's time covers everything it called
+    assert trace.time_ns["Number.log"] >= trace.time_ns["Number.mul"]
+    assert "Number.log" in trace.report()
+
+    # Exiting, even on an error, puts the plain methods back
+    assert all(Number.__dict__[name] is method for name, method in originals.items())
+    try:
+        with Trace():
+            n_.one.div(n_.zero)
+    except ZeroDivisionError:
+        pass
+    assert all(Number.__dict__[name] is method for name, method in originals.items())
+
+    # Tower methods are counted under Tower, nested Traces are refused
+    with Trace() as trace:
+        assert_equal(n_.two.tetr(n_.five, lazy=True).compare(n_.two.tetr(n_.four, lazy=True)), "greater")
+        nested = False
+        try:
+            with Trace():
+                pass
+        except Exception:
+            nested = True
+        assert nested
+    assert_equal(trace.calls["Tower.compare"], 1)
+    assert_equal(trace.calls["Tower.materialize"], 0)
+    assert_equal(trace.allocations["Tower"], 2)
+
+    # Higher ranks reach the operations below through the traced methods
+    with Trace() as trace:
+        n_.two.tetr(n_.four)
+        n_.two.hyper(2, n_.three)
+    assert trace.calls["Number.pow"] > 0
+    assert trace.calls["Number.mul"] > 0
+    # Magnitude views count under their backend
+    view = PackedMagnitude.__dict__["_view"]
+    packed = Number(NumberState(PackedMagnitude(5), Sign.pos))
+    with Trace() as trace:
+        packed.mul(n_.three)
+    assert trace.allocations["PackedMagnitude"] > 0
+    assert PackedMagnitude.__dict__["_view"] is view
+
+
+if __name__ == "__main__":
+    tracing_unit_test()